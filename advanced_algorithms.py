@@ -1,172 +1,916 @@
 """
 Advanced Game Tree Algorithms for Chinese Chess AI
-Contains AlphaBeta++, Negamax, and MTD(f) algorithms
+Contains AlphaBeta++, Negamax, PVS and MTD(f) algorithms
 """
 
-from math import inf
 from time import time
 from abc import abstractmethod
 from game_state import GameState
 from node import NodeMinimax, NodeMCTS
 from team import Team
+from threat import THREAT_PIECE_VALUES, static_exchange_evaluation
+from algorithm_config import HEURISTIC_CONFIG, LMR_CONFIG
 
 # Import GameTree base class
 from game_tree import GameTree
+from optimization_config import (
+    SEARCH_TIME_BUDGET_MS, USE_QUIESCENCE, QUIESCENCE_MAX_DEPTH,
+    QUIESCENCE_CHECKS, QUIESCENCE_DELTA_MARGIN,
+    USE_NULL_MOVE, NULL_MOVE_MIN_DEPTH, NULL_MOVE_REDUCTION,
+    NULL_MOVE_MIN_MAJOR_PIECES, NULL_MOVE_VERIFICATION,
+    USE_INTERNAL_ITERATIVE_DEEPENING, IID_MIN_DEPTH, IID_REDUCTION, USE_NODE_FREE_SEARCH,
+    USE_MULTITHREADING, NUM_THREADS, PARALLEL_SEARCH_MODE,
+)
+from parallel_search import PARALLEL_SEARCH_MODES, rank_root_scores
 
 # Import performance utilities safely
 try:
-    from performance_utils import transposition_table, performance_monitor
+    from performance_utils import TranspositionTable, transposition_table, performance_monitor
+    if not HEURISTIC_CONFIG["transposition_table"]["enabled"]:
+        transposition_table = None
 except ImportError:
     # Fallback if performance_utils not available
     transposition_table = None
     performance_monitor = None
 
 
+def quiescence_search(
+    game_state: GameState,
+    alpha: int,
+    beta: int,
+    ply: int,
+    depth: int = QUIESCENCE_MAX_DEPTH,
+) -> int:
+    """Search the captures of a horizon position until it is quiet.
+    The value is seen from the side to move; the side not in check may stand pat.
+    Captures that lose material (static exchange) or cannot reach alpha
+    (delta pruning) are skipped"""
+    NodeMinimax.check_deadline()
+
+    # In check there is no standing pat: every evasion is searched
+    if game_state.is_in_check():
+        moves = game_state.generate_moves()
+        if len(moves) == 0:
+            return -GameState.MATE_SCORE + ply
+        if depth > 0:
+            best_value = -GameState.INFINITE_SCORE
+            for move in moves:
+                undo = game_state.make_move(*move)
+                try:
+                    value = -quiescence_search(game_state, -beta, -alpha, ply + 1, depth - 1)
+                finally:
+                    game_state.unmake_move(undo)
+                best_value = max(best_value, value)
+                alpha = max(alpha, value)
+                if alpha >= beta:
+                    break
+            return best_value
+
+    stand_pat = GameState.adjust_mate_score(game_state.value, ply)
+    stand_pat *= game_state._current_team.value
+    if stand_pat >= beta or depth <= 0 or abs(stand_pat) >= GameState.MATE_THRESHOLD:
+        return stand_pat
+
+    best_value = stand_pat
+    alpha = max(alpha, stand_pat)
+    board = game_state.board
+
+    for old_pos, new_pos in game_state.generate_capture_moves():
+        victim = board[new_pos[0]][new_pos[1]]
+        # Delta pruning: even winning the victim for free does not reach alpha
+        if stand_pat + THREAT_PIECE_VALUES[victim[1]] + QUIESCENCE_DELTA_MARGIN <= alpha:
+            continue
+        # Losing captures are left to the full-width search
+        if static_exchange_evaluation(board, old_pos, new_pos) < 0:
+            continue
+        if not game_state.is_move_legal(old_pos, new_pos):
+            continue
+
+        # The captures are played on the game state itself and taken back
+        undo = game_state.make_move(old_pos, new_pos)
+        try:
+            value = -quiescence_search(game_state, -beta, -alpha, ply + 1, depth - 1)
+        finally:
+            game_state.unmake_move(undo)
+        best_value = max(best_value, value)
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            return best_value
+
+    # Optionally look at the quiet moves giving check right past the horizon
+    if QUIESCENCE_CHECKS and depth == QUIESCENCE_MAX_DEPTH:
+        for old_pos, new_pos in game_state.generate_moves():
+            if board[new_pos[0]][new_pos[1]] != "NN":
+                continue
+            undo = game_state.make_move(old_pos, new_pos)
+            try:
+                if not game_state.is_in_check():
+                    continue
+                value = -quiescence_search(game_state, -beta, -alpha, ply + 1, depth - 1)
+            finally:
+                game_state.unmake_move(undo)
+            best_value = max(best_value, value)
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
+
+    return best_value
+
+
+def horizon_value(game_state: GameState, alpha: int, beta: int, ply: int) -> int:
+    """Return the value of a position at the horizon, seen from the side to move:
+    its quiescence search, or its static evaluation"""
+    if USE_QUIESCENCE:
+        return quiescence_search(game_state, alpha, beta, ply)
+    value = GameState.adjust_mate_score(game_state.value, ply)
+    return value * game_state._current_team.value
+
+
+def probe_transposition_table(board_hash: int, depth: int, alpha: int, beta: int, ply: int) -> tuple:
+    """Look the position up in the transposition table and return
+    (value if the stored bounds settle it else None, narrowed alpha, narrowed beta, hash move).
+    The root is never settled, so it always has children to pick a move from"""
+    if transposition_table is None:
+        return None, alpha, beta, None
+    entry = transposition_table.probe(board_hash)
+    if entry is None:
+        return None, alpha, beta, None
+    entry_depth, lower, upper, hash_move = entry
+    if entry_depth < depth or ply == 0:
+        return None, alpha, beta, hash_move
+
+    # Both bounds may be known (e.g. from the null-window probes of MTD(f))
+    if lower is not None:
+        lower = transposition_table.score_from_tt(lower, ply, GameState.MATE_THRESHOLD)
+    if upper is not None:
+        upper = transposition_table.score_from_tt(upper, ply, GameState.MATE_THRESHOLD)
+
+    if lower is not None and (lower >= beta or lower == upper):
+        return lower, alpha, beta, hash_move
+    if upper is not None and upper <= alpha:
+        return upper, alpha, beta, hash_move
+    if lower is not None:
+        alpha = max(alpha, lower)
+    if upper is not None:
+        beta = min(beta, upper)
+    return None, alpha, beta, hash_move
+
+
+def store_transposition_table(
+    board_hash: int, depth: int, value: int, alpha: int, beta: int, ply: int, move: tuple = None
+) -> None:
+    """Store a search result, bounded by the window (alpha, beta) it was searched with.
+    A fail-low result has no best move, so the stored one is kept"""
+    if transposition_table is None:
+        return
+    if value <= alpha:
+        flag = TranspositionTable.UPPER
+        move = None
+    elif value >= beta:
+        flag = TranspositionTable.LOWER
+    else:
+        flag = TranspositionTable.EXACT
+    transposition_table.store(
+        board_hash, depth,
+        transposition_table.score_to_tt(value, ply, GameState.MATE_THRESHOLD),
+        flag,
+        move,
+    )
+
+
+class SearchHeuristics:
+    """Move ordering tables shared by all the nodes of a game tree's searches:
+    killer moves by ply, history by piece and target square and countermoves
+    by the previous move. They are kept (aged) from one move of the game to the next"""
+
+    def __init__(self) -> None:
+        killer_config = HEURISTIC_CONFIG["killer_moves"]
+        history_config = HEURISTIC_CONFIG["history_heuristic"]
+        countermove_config = HEURISTIC_CONFIG["countermoves"]
+
+        self.killer_weight = killer_config["weight"] if killer_config["enabled"] else 0
+        self.max_killers = killer_config["max_killers_per_depth"]
+        self.history_enabled = history_config["enabled"] and history_config["update_on_cutoff"]
+        self.history_initial_value = history_config["initial_value"]
+        self.history_max_value = history_config["max_value"]
+        self.countermove_weight = (
+            countermove_config["weight"] if countermove_config["enabled"] else 0
+        )
+
+        self.killers = list()  # ply -> list of moves, most recent first
+        self.history = dict()  # piece notation -> score of each of the 90 target squares
+        self.countermoves = dict()  # previous move -> reply that caused a cutoff
+
+    def get_move_score(self, board: list, move: tuple, previous_move: tuple, ply: int) -> int:
+        """Return the ordering score of a quiet move"""
+        score = self.get_history(board, move)
+
+        if self.is_killer(move, ply):
+            score += self.killer_weight
+
+        if previous_move is not None and self.countermoves.get(previous_move) == move:
+            score += self.countermove_weight
+
+        return score
+
+    def is_killer(self, move: tuple, ply: int) -> bool:
+        """Return True if the move is a killer move at the ply"""
+        return ply < len(self.killers) and move in self.killers[ply]
+
+    def get_history(self, board: list, move: tuple) -> int:
+        """Return the history score of the moving piece on the target square"""
+        old_pos, new_pos = move
+        table = self.history.get(board[old_pos[0]][old_pos[1]])
+        return table[new_pos[0] * 9 + new_pos[1]] if table is not None else 0
+
+    def update(self, board: list, move: tuple, previous_move: tuple, depth: int, ply: int) -> None:
+        """Record a quiet move that caused a beta cutoff"""
+        old_pos, new_pos = move
+
+        # Killer moves
+        if self.killer_weight:
+            while len(self.killers) <= ply:
+                self.killers.append(list())
+            killers = self.killers[ply]
+            if move not in killers:
+                killers.insert(0, move)
+                del killers[self.max_killers:]
+
+        # History heuristic, halved as a whole before it outgrows the capture scores
+        if self.history_enabled:
+            notation = board[old_pos[0]][old_pos[1]]
+            table = self.history.get(notation)
+            if table is None:
+                table = self.history[notation] = [self.history_initial_value] * 90
+            index = new_pos[0] * 9 + new_pos[1]
+            table[index] += depth * depth
+            if table[index] > self.history_max_value:
+                self.age_history()
+
+        # Countermove heuristic
+        if self.countermove_weight and previous_move is not None:
+            self.countermoves[previous_move] = move
+
+    def age_history(self) -> None:
+        """Halve every history score"""
+        for table in self.history.values():
+            table[:] = [value // 2 for value in table]
+
+    def age(self, plies_played: int = 2) -> None:
+        """Carry the tables over to the next search, the root being plies_played deeper"""
+        self.killers = self.killers[plies_played:]
+        self.age_history()
+
+
 class NodeAlphaBeta(NodeMinimax):
     """Node for AlphaBeta++ algorithm with enhanced move ordering"""
 
+    # Winning and even captures are tried before killers, losing captures
+    # (negative exchange) after killers but still before quiet moves
+    GOOD_CAPTURE_SCORE = 10000
+    LOSING_CAPTURE_SCORE = 500
+    # The best move of the previous search of the node goes first
+    BEST_MOVE_SCORE = 100000
+
     def __init__(self, game_state: GameState, parent, parent_move: tuple) -> None:
         super().__init__(game_state, parent, parent_move)
-        self.killer_moves = []  # Killer move heuristic
-        self.history = {}  # Move history heuristic
-
-    def get_move_order_score(self, move):
-        """Calculate score for move ordering heuristic"""
+        # Search-wide move ordering tables, shared with the parent
+        self.heuristics = parent.heuristics if parent is not None else None
+        self.best_child_move = None
+        self._static_order_scores = None
+        # Null moves are not allowed right after a null move (or while verifying one)
+        self.null_move_allowed = parent_move is not None or parent is None
+
+    def _get_static_order_score(self, move) -> int:
+        """Calculate the part of the ordering score that only depends on the position"""
+        return self.get_static_order_score(self.game_state, move)
+
+    @staticmethod
+    def get_static_order_score(game_state: GameState, move) -> int:
+        """Calculate the ordering score of a move in a game state, without the
+        search-wide tables (shared with the node-free search)"""
         score = 0
 
-        # Killer move heuristic
-        if move in self.killer_moves:
-            score += 1000
-
-        # Capture heuristic (prioritize captures)
+        # Capture heuristic: static exchange first, MVV/LVA to break ties
         old_pos, new_pos = move
-        if self.game_state.board[new_pos[0]][new_pos[1]] != "NN":
-            score += 500
+        board = game_state.board
+        threats = game_state.threats
+        victim = board[new_pos[0]][new_pos[1]]
+        if victim != "NN":
+            exchange = static_exchange_evaluation(board, old_pos, new_pos)
+            mvv_lva = (
+                THREAT_PIECE_VALUES[victim[1]]
+                - THREAT_PIECE_VALUES[board[old_pos[0]][old_pos[1]][1]] // 10
+            )
+            if exchange >= 0:
+                score += NodeAlphaBeta.GOOD_CAPTURE_SCORE + exchange + mvv_lva // 100
+            else:
+                score += NodeAlphaBeta.LOSING_CAPTURE_SCORE + exchange // 10 + mvv_lva // 100
 
-        # History heuristic
-        score += self.history.get(move, 0)
+        # Evasion heuristic (move our hanging pieces out of danger)
+        score += threats.hanging_value(old_pos, game_state._current_team) // 2
 
         return score
 
-    def sort_children_with_heuristic(self):
-        """Sort children using move ordering heuristics"""
-        if self._is_children_sorted:
-            return
+    def get_move_order_score(self, move, ply: int = 0):
+        """Calculate score for move ordering heuristic"""
+        if self._static_order_scores is None:
+            self._static_order_scores = dict()
+        score = self._static_order_scores.get(move)
+        if score is None:
+            score = self._static_order_scores[move] = self._get_static_order_score(move)
 
-        # Calculate scores for each child
-        scores = []
-        for child in self.list_of_children:
-            move = child.parent_move
-            score = self.get_move_order_score(move)
-            scores.append((score, child))
+        if move == self.best_child_move:
+            score += self.BEST_MOVE_SCORE
+
+        # Killer, countermove and history heuristics for quiet moves
+        board = self.game_state.board
+        if self.heuristics is not None and board[move[1][0]][move[1][1]] == "NN":
+            score += self.heuristics.get_move_score(board, move, self.parent_move, ply)
+
+        return score
 
-        # Sort by score (descending)
-        scores.sort(key=lambda x: x[0], reverse=True)
-        self.list_of_children = [child for _, child in scores]
+    def sort_children_with_heuristic(self, ply: int = 0):
+        """Sort children using move ordering heuristics
+        (on every visit, as the search-wide tables keep learning)"""
+        self.list_of_children.sort(
+            key=lambda child: self.get_move_order_score(child.parent_move, ply),
+            reverse=True,
+        )
         self._is_children_sorted = True
 
-    def update_killer_moves(self, move, depth):
-        """Update killer move list for this depth"""
-        if len(self.killer_moves) < 2:
-            self.killer_moves.append(move)
-        else:
-            self.killer_moves[0] = self.killer_moves[1]
-            self.killer_moves[1] = move
+    def _can_try_null_move(self, depth: int, ply: int, beta: int) -> bool:
+        """Return True if passing may be tried against beta (seen from the side to move):
+        enough depth left, not the root, no null move just played, not in check,
+        enough material to rule out zugzwang and a static value already reaching beta"""
+        if not self.null_move_allowed:
+            return False
+        return self.is_null_move_possible(self.game_state, depth, ply, beta)
+
+    @staticmethod
+    def is_null_move_possible(game_state: GameState, depth: int, ply: int, beta: int) -> bool:
+        """The conditions of _can_try_null_move that only depend on the game state"""
+        if not USE_NULL_MOVE or depth < NULL_MOVE_MIN_DEPTH or ply == 0:
+            return False
+        if abs(beta) >= GameState.MATE_THRESHOLD:
+            return False
+
+        team = game_state._current_team
+        if game_state.count_major_pieces(team) < NULL_MOVE_MIN_MAJOR_PIECES:
+            return False
+        if game_state.value * team.value < beta:
+            return False
+        return not game_state.is_in_check()
+
+    @staticmethod
+    def get_null_move_reduction(depth: int) -> int:
+        """Return the depth reduction of the null-move search (adaptive to the depth)"""
+        return NULL_MOVE_REDUCTION + (1 if depth >= 6 else 0)
+
+    def _create_null_child(self):
+        """Create the (detached) node reached by passing; its subtree is not
+        linked into the tree, so it is not counted in the tree's node budget"""
+        null_child = self._create_node(self.game_state.generate_null_move_game_state(), self, None)
+        null_child.tree = None
+        return null_child
+
+    def get_late_move_reduction(self, child, move_number: int, depth: int, ply: int) -> int:
+        """Return how many plies shallower the child may be searched (0: full depth).
+        Only late quiet moves are reduced, never in check, when giving check,
+        or for the killer moves and the node's previous best move"""
+        reduction = self.compute_late_move_reduction(
+            self.game_state, child.parent_move, move_number, depth, ply,
+            self.heuristics, self.best_child_move,
+        )
+        if reduction > 0 and child.game_state.is_in_check():
+            return 0
+        return reduction
+
+    @staticmethod
+    def compute_late_move_reduction(
+        game_state: GameState, move, move_number: int, depth: int, ply: int,
+        heuristics, best_move,
+    ) -> int:
+        """The reduction of get_late_move_reduction before the move is played
+        (the caller still has to rule out moves giving check)"""
+        if not LMR_CONFIG["enabled"] or depth < LMR_CONFIG["min_depth"]:
+            return 0
+        columns = LMR_CONFIG["move_number_columns"]
+        if move_number < columns[0]:
+            return 0
+
+        board = game_state.board
+        if board[move[1][0]][move[1][1]] != "NN" or move == best_move:
+            return 0
+        if heuristics is not None and heuristics.is_killer(move, ply):
+            return 0
+        if game_state.is_in_check():
+            return 0
+
+        table = LMR_CONFIG["reduction_table"]
+        row = table[min(depth - LMR_CONFIG["min_depth"], len(table) - 1)]
+        column = sum(1 for start in columns if move_number >= start) - 1
+        reduction = row[column]
+
+        # Moves with a good history are reduced less
+        if (
+            heuristics is not None
+            and heuristics.get_history(board, move) >= LMR_CONFIG["history_threshold"]
+        ):
+            reduction -= 1
+
+        # Always leave at least one ply before the horizon
+        return max(0, min(reduction, depth - 2))
+
+    def _record_cutoff(self, child, depth: int, ply: int) -> None:
+        """Update the search-wide tables with a child that caused a beta cutoff"""
+        move = child.parent_move
+        board = self.game_state.board
+        if self.heuristics is not None and board[move[1][0]][move[1][1]] == "NN":
+            self.heuristics.update(board, move, self.parent_move, depth, ply)
+
+    def minimax(
+        self,
+        depth: int,
+        max_turn: bool,
+        alpha: int = -GameState.INFINITE_SCORE,
+        beta: int = GameState.INFINITE_SCORE,
+        ply: int = 0,
+    ) -> int:
+        """Minimax with alpha-beta pruning, searching the children of
+        every interior node in heuristic order and resolving captures at the horizon"""
+        self.check_deadline()
+        self.minimax_value = None
+
+        # If the node reaches the target depth
+        if depth == 0:
+            if not USE_QUIESCENCE:
+                value = GameState.adjust_mate_score(self.game_state.value, ply)
+            elif self.game_state._current_team is Team.RED:
+                value = quiescence_search(self.game_state, alpha, beta, ply)
+            else:
+                value = -quiescence_search(self.game_state, -beta, -alpha, ply)
+            self.minimax_value = value
+            return value
+
+        self.generate_all_children()
+
+        # If the node has no child nodes
+        if len(self.list_of_children) == 0:
+            if self.game_state._current_team is Team.RED:
+                self.minimax_value = -GameState.MATE_SCORE + ply
+            else:
+                self.minimax_value = GameState.MATE_SCORE - ply
+            return self.minimax_value
+
+        # Null-move pruning: if passing still fails high, the node is not worth a full search
+        if self._can_try_null_move(depth, ply, beta if max_turn else -alpha):
+            reduction = self.get_null_move_reduction(depth)
+            null_child = self._create_null_child()
+            if max_turn:
+                value = null_child.minimax(depth - 1 - reduction, False, beta - 1, beta, ply + 1)
+                fails_high = value >= beta
+            else:
+                value = null_child.minimax(depth - 1 - reduction, True, alpha, alpha + 1, ply + 1)
+                fails_high = value <= alpha
+
+            if fails_high and NULL_MOVE_VERIFICATION:
+                self.null_move_allowed = False
+                try:
+                    value = self.minimax(depth - reduction, max_turn, alpha, beta, ply)
+                finally:
+                    self.null_move_allowed = True
+                fails_high = value >= beta if max_turn else value <= alpha
+
+            if fails_high:
+                # A mate found after passing is not proven
+                if abs(value) >= GameState.MATE_THRESHOLD:
+                    value = beta if max_turn else alpha
+                self.minimax_value = value
+                return value
+
+        self.sort_children_with_heuristic(ply)
+
+        best_value = -GameState.INFINITE_SCORE if max_turn else GameState.INFINITE_SCORE
+        best_child = None
+        for move_number, child in enumerate(self.list_of_children):
+            # Late move reductions: a reduced null-window search first,
+            # the full search only if the move turns out better than expected.
+            # A result not searched again is only a bound, which may tie with the best
+            # value: the move played comes from best_child_move, never from the values
+            reduction = self.get_late_move_reduction(child, move_number, depth, ply)
+            if reduction > 0:
+                if max_turn:
+                    value = child.minimax(depth - 1 - reduction, False, alpha, alpha + 1, ply + 1)
+                    needs_full_search = value > alpha
+                else:
+                    value = child.minimax(depth - 1 - reduction, True, beta - 1, beta, ply + 1)
+                    needs_full_search = value < beta
+            if reduction == 0 or needs_full_search:
+                value = child.minimax(depth - 1, not max_turn, alpha, beta, ply + 1)
+
+            if max_turn:
+                if value > best_value:
+                    best_value, best_child = value, child
+                alpha = max(alpha, value)
+            else:
+                if value < best_value:
+                    best_value, best_child = value, child
+                beta = min(beta, value)
+
+            if beta <= alpha:
+                self._record_cutoff(child, depth, ply)
+                break
 
-    def update_history(self, move, depth):
-        """Update history heuristic"""
-        self.history[move] = self.history.get(move, 0) + depth * depth
+        self.best_child_move = best_child.parent_move
+        self.minimax_value = best_value
+        return best_value
 
     def _create_node(self, game_state: GameState, parent, parent_move: tuple):
         """Create a new AlphaBeta++ node"""
         return NodeAlphaBeta(game_state, parent, parent_move)
 
+    def best_move(self):
+        """Return the child of the best move found by the last search
+        (after cutoffs its siblings only hold bounds, which may tie with its value)"""
+        for child in self.list_of_children:
+            if child.parent_move == self.best_child_move:
+                return child
+        return self.list_of_children[0]
+
 
-class NodeNegamax(NodeMinimax):
-    """Node for Negamax algorithm with transposition table"""
+class NodeNegamax(NodeAlphaBeta):
+    """Node for Negamax algorithm with transposition table
+    (children are searched in the AlphaBeta++ move order)"""
 
     def __init__(self, game_state: GameState, parent, parent_move: tuple) -> None:
         super().__init__(game_state, parent, parent_move)
         self.hash_value = None
 
-    def negamax(self, depth: int, alpha: float = -inf, beta: float = inf) -> float:
-        """Negamax with alpha-beta pruning and transposition table"""
+    def negamax(
+        self,
+        depth: int,
+        alpha: int = -GameState.INFINITE_SCORE,
+        beta: int = GameState.INFINITE_SCORE,
+        ply: int = 0,
+    ) -> int:
+        """Negamax with alpha-beta pruning and transposition table.
+        The value is seen from the side to move of this node"""
+
+        self.check_deadline()
+
+        # Below the root, the node-free search takes over
+        if ply > 0 and USE_NODE_FREE_SEARCH:
+            search = DepthFirstSearch(self.heuristics)
+            value = search.negamax(
+                self.game_state, depth, alpha, beta, ply, self.parent_move, self.null_move_allowed
+            )
+            self.minimax_value = value
+            return value
 
         # Check transposition table
-        board_hash = hash(tuple(map(tuple, self.game_state.board)))
-        lookup_value = None
-        lookup_flag = None
-        
-        if transposition_table is not None:
-            lookup_value, lookup_flag = transposition_table.lookup(board_hash, depth)
-
-            if lookup_value is not None:
-                if lookup_flag == 'EXACT':
-                    return lookup_value
-                elif lookup_flag == 'LOWER':
-                    alpha = max(alpha, lookup_value)
-                elif lookup_flag == 'UPPER':
-                    beta = min(beta, lookup_value)
-
-                if alpha >= beta:
-                    return lookup_value
+        board_hash = self.game_state.position_hash
+        original_alpha = alpha
+        value, alpha, beta, hash_move = probe_transposition_table(board_hash, depth, alpha, beta, ply)
+        if value is not None:
+            self.minimax_value = value
+            if hash_move is not None:
+                self.best_child_move = hash_move
+            return value
 
         # Terminal node
         if depth == 0:
-            value = self.game_state.value
-            if self.game_state._current_team is Team.RED:
-                value = -value
-            if transposition_table is not None:
-                transposition_table.store(board_hash, depth, value, 'EXACT')
+            value = horizon_value(self.game_state, alpha, beta, ply)
+            self.minimax_value = value
+            # The quiescence value is only a bound outside the window
+            store_transposition_table(board_hash, depth, value, original_alpha, beta, ply)
             return value
 
+        # Null-move pruning: if passing still fails high, the node is not worth a full search
+        if self._can_try_null_move(depth, ply, beta):
+            reduction = self.get_null_move_reduction(depth)
+            null_child = self._create_null_child()
+            value = -null_child.negamax(depth - 1 - reduction, -beta, -beta + 1, ply + 1)
+
+            if value >= beta and NULL_MOVE_VERIFICATION:
+                self.null_move_allowed = False
+                try:
+                    value = self.negamax(depth - reduction, beta - 1, beta, ply)
+                finally:
+                    self.null_move_allowed = True
+
+            if value >= beta:
+                # A mate found after passing is not proven
+                value = beta if value >= GameState.MATE_THRESHOLD else value
+                self.minimax_value = value
+                store_transposition_table(board_hash, depth, value, beta - 1, beta, ply)
+                return value
+
+        # Internal iterative deepening: a PV node without a hash move gets one
+        # from a shallower search
+        if hash_move is None:
+            hash_move = self.best_child_move
+        if (
+            hash_move is None
+            and USE_INTERNAL_ITERATIVE_DEEPENING
+            and depth >= IID_MIN_DEPTH
+            and beta - alpha > 1
+        ):
+            self.negamax(depth - IID_REDUCTION, alpha, beta, ply)
+            hash_move = self.best_child_move
+
+        # The hash move is searched first, before the other moves are generated
+        hash_child = None
+        if hash_move is not None:
+            self.best_child_move = hash_move
+            if not self._is_generated_all_children:
+                hash_child = self._create_hash_move_child(hash_move)
+
+        if hash_child is not None:
+            hash_value = -hash_child.negamax(depth - 1, -beta, -alpha, ply + 1)
+            if hash_value >= beta:
+                self._record_cutoff(hash_child, depth, ply)
+                self.minimax_value = hash_value
+                store_transposition_table(board_hash, depth, hash_value, alpha, beta, ply, hash_move)
+                return hash_value
+
         self.generate_all_children()
+        self.sort_children_with_heuristic(ply)
 
-        # No moves available
+        # No moves available: the side to move is checkmated
         if len(self.list_of_children) == 0:
-            value = -inf if self.game_state._current_team is Team.RED else inf
-            if transposition_table is not None:
-                transposition_table.store(board_hash, depth, value, 'EXACT')
+            value = -GameState.MATE_SCORE + ply
+            self.minimax_value = value
+            store_transposition_table(
+                board_hash, depth, value, -GameState.INFINITE_SCORE, GameState.INFINITE_SCORE, ply
+            )
             return value
 
-        max_value = -inf
-        flag = 'UPPER'
+        if hash_child is not None:
+            # Keep the searched subtree in place of its freshly generated twin
+            self.list_of_children = [
+                child for child in self.list_of_children if child.parent_move != hash_move
+            ]
+            self.list_of_children.insert(0, hash_child)
+            max_value = self._search_children(depth, alpha, beta, ply, hash_value)
+        else:
+            max_value = self._search_children(depth, alpha, beta, ply)
 
-        for child in self.list_of_children:
-            value = -child.negamax(depth - 1, -beta, -alpha)
-            max_value = max(max_value, value)
+        self.minimax_value = max_value
+        store_transposition_table(
+            board_hash, depth, max_value, original_alpha, beta, ply, self.best_child_move
+        )
+        return max_value
+
+    def _create_hash_move_child(self, move: tuple):
+        """Create the child of a hash move without generating the other children
+        (return None if the move is not admissible in this position)"""
+        result = self.game_state.generate_game_state_with_stored_move(*move)
+        if result is None:
+            return None
+        return self._create_node(result[0], self, move)
+
+    def _search_children(
+        self, depth: int, alpha: int, beta: int, ply: int, first_value: int = None
+    ) -> int:
+        """Search the (ordered) children with the full window, return the best value.
+        A first_value means the first child was already searched with this window"""
+        max_value = -GameState.INFINITE_SCORE
+
+        for move_number, child in enumerate(self.list_of_children):
+            if move_number == 0 and first_value is not None:
+                value = first_value
+            else:
+                # Late move reductions, re-searched at full depth on fail-high
+                reduction = self.get_late_move_reduction(child, move_number, depth, ply)
+                if reduction > 0:
+                    value = -child.negamax(depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)
+                if reduction == 0 or value > alpha:
+                    value = -child.negamax(depth - 1, -beta, -alpha, ply + 1)
+
+            if value > max_value:
+                max_value = value
+                self.best_child_move = child.parent_move
             alpha = max(alpha, value)
 
             if alpha >= beta:
-                flag = 'LOWER'
+                self._record_cutoff(child, depth, ply)
                 break
 
-        if max_value <= alpha:
-            flag = 'UPPER'
-        elif max_value >= beta:
-            flag = 'LOWER'
-        else:
-            flag = 'EXACT'
-
-        if transposition_table is not None:
-            transposition_table.store(board_hash, depth, max_value, flag)
         return max_value
 
     def _create_node(self, game_state: GameState, parent, parent_move: tuple):
         """Create a new Negamax node"""
         return NodeNegamax(game_state, parent, parent_move)
 
+
+class NodePVS(NodeNegamax):
+    """Node for Principal Variation Search: the first child is searched with
+    the full window, the others with a null window and re-searched on fail-high"""
+
+    def __init__(self, game_state: GameState, parent, parent_move: tuple) -> None:
+        super().__init__(game_state, parent, parent_move)
+        self.best_child = None
+
+    def free_children(self) -> None:
+        super().free_children()
+        self.best_child = None
+
+    def _search_children(
+        self, depth: int, alpha: int, beta: int, ply: int, first_value: int = None
+    ) -> int:
+        """Search the first child with the full window and prove the others worse"""
+        max_value = -GameState.INFINITE_SCORE
+        self.best_child = None
+
+        for move_number, child in enumerate(self.list_of_children):
+            if move_number == 0 and first_value is not None:
+                value = first_value
+            elif move_number == 0:
+                value = -child.negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # Late moves are first searched shallower, and again at full depth on fail-high
+                reduction = self.get_late_move_reduction(child, move_number, depth, ply)
+                value = -child.negamax(depth - 1 - reduction, -alpha - 1, -alpha, ply + 1)
+                if reduction > 0 and value > alpha:
+                    value = -child.negamax(depth - 1, -alpha - 1, -alpha, ply + 1)
+                # Fail-high inside the window: the child may be the new best, re-search it
+                if alpha < value < beta:
+                    value = -child.negamax(depth - 1, -beta, -alpha, ply + 1)
+
+            if value > max_value:
+                max_value = value
+                self.best_child = child
+                self.best_child_move = child.parent_move
+            alpha = max(alpha, value)
+
+            if alpha >= beta:
+                self._record_cutoff(child, depth, ply)
+                break
+
+        return max_value
+
+    def _create_node(self, game_state: GameState, parent, parent_move: tuple):
+        """Create a new PVS node"""
+        return NodePVS(game_state, parent, parent_move)
+
     def best_move(self):
-        """Return best move for Negamax"""
-        best_value = -inf
-        best_children = []
+        """Return the child that produced the value (siblings only hold bounds)"""
+        if self.best_child is not None:
+            return self.best_child
+        return super().best_move()
+
+
+class DepthFirstSearch:
+    """Principal variation search below the root over a single game state:
+    moves are played on it and taken back (make/unmake), no node is created,
+    and what the search learns lives in the transposition table and the
+    search-wide heuristic tables. Memory no longer grows with the nodes visited"""
+
+    def __init__(self, heuristics: SearchHeuristics = None) -> None:
+        self.heuristics = heuristics
+
+    def negamax(
+        self,
+        game_state: GameState,
+        depth: int,
+        alpha: int,
+        beta: int,
+        ply: int,
+        previous_move: tuple = None,
+        null_move_allowed: bool = True,
+    ) -> int:
+        """Search the game state (restored on return, even on timeout)
+        and return its value seen from the side to move"""
+        NodeMinimax.check_deadline()
+
+        board_hash = game_state.position_hash
+        original_alpha = alpha
+        value, alpha, beta, hash_move = probe_transposition_table(board_hash, depth, alpha, beta, ply)
+        if value is not None:
+            return value
 
-        for child in self.list_of_children:
-            if child.minimax_value == self.minimax_value:
-                best_children.append(child)
+        if depth <= 0:
+            value = horizon_value(game_state, alpha, beta, ply)
+            store_transposition_table(board_hash, 0, value, original_alpha, beta, ply)
+            return value
+
+        # Null-move pruning
+        if null_move_allowed and NodeAlphaBeta.is_null_move_possible(game_state, depth, ply, beta):
+            reduction = NodeAlphaBeta.get_null_move_reduction(depth)
+            undo = game_state.make_null_move()
+            try:
+                value = -self.negamax(
+                    game_state, depth - 1 - reduction, -beta, -beta + 1, ply + 1, None, False
+                )
+            finally:
+                game_state.unmake_move(undo)
+
+            if value >= beta and NULL_MOVE_VERIFICATION:
+                value = self.negamax(
+                    game_state, depth - reduction, beta - 1, beta, ply, previous_move, False
+                )
+
+            if value >= beta:
+                # A mate found after passing is not proven
+                value = beta if value >= GameState.MATE_THRESHOLD else value
+                store_transposition_table(board_hash, depth, value, beta - 1, beta, ply)
+                return value
+
+        # Internal iterative deepening for PV nodes without a hash move
+        if (
+            hash_move is None
+            and transposition_table is not None
+            and USE_INTERNAL_ITERATIVE_DEEPENING
+            and depth >= IID_MIN_DEPTH
+            and beta - alpha > 1
+        ):
+            self.negamax(
+                game_state, depth - IID_REDUCTION, alpha, beta, ply, previous_move, null_move_allowed
+            )
+            entry = transposition_table.probe(board_hash)
+            hash_move = entry[3] if entry is not None else None
+
+        best_value = -GameState.INFINITE_SCORE
+        best_move = None
+        board = game_state.board
+
+        move_number = -1
+        for move in self._ordered_moves(game_state, hash_move, previous_move, ply):
+            # Legality is only checked for the moves actually searched
+            if not game_state.is_move_legal(*move):
+                continue
+            move_number += 1
+            is_quiet = board[move[1][0]][move[1][1]] == "NN"
+            reduction = 0
+            if move_number > 0:
+                reduction = NodeAlphaBeta.compute_late_move_reduction(
+                    game_state, move, move_number, depth, ply, self.heuristics, hash_move
+                )
+
+            undo = game_state.make_move(*move)
+            try:
+                if move_number == 0:
+                    value = -self.negamax(game_state, depth - 1, -beta, -alpha, ply + 1, move)
+                else:
+                    # Moves giving check are never reduced
+                    if reduction > 0 and game_state.is_in_check():
+                        reduction = 0
+                    value = -self.negamax(
+                        game_state, depth - 1 - reduction, -alpha - 1, -alpha, ply + 1, move
+                    )
+                    if reduction > 0 and value > alpha:
+                        value = -self.negamax(game_state, depth - 1, -alpha - 1, -alpha, ply + 1, move)
+                    if alpha < value < beta:
+                        value = -self.negamax(game_state, depth - 1, -beta, -alpha, ply + 1, move)
+            finally:
+                game_state.unmake_move(undo)
+
+            if value > best_value:
+                best_value = value
+                best_move = move
+            alpha = max(alpha, value)
+
+            if alpha >= beta:
+                if is_quiet and self.heuristics is not None:
+                    self.heuristics.update(board, move, previous_move, depth, ply)
+                break
 
-        from random import choice
-        return choice(best_children) if best_children else self.list_of_children[0]
+        # No moves available: the side to move is checkmated
+        if best_move is None:
+            best_value = -GameState.MATE_SCORE + ply
+            store_transposition_table(
+                board_hash, depth, best_value, -GameState.INFINITE_SCORE, GameState.INFINITE_SCORE, ply
+            )
+            return best_value
+
+        store_transposition_table(board_hash, depth, best_value, original_alpha, beta, ply, best_move)
+        return best_value
+
+    def _ordered_moves(self, game_state: GameState, hash_move: tuple, previous_move: tuple, ply: int):
+        """Yield the hash move first and only then generate and order the others,
+        so a cutoff by the hash move spares the move generation.
+        The moves are not checked for legality"""
+        if hash_move is not None:
+            if game_state.is_move_admissible(*hash_move):
+                yield hash_move
+            else:
+                hash_move = None
+
+        board = game_state.board
+        heuristics = self.heuristics
+        scored_moves = list()
+        for move in game_state.generate_moves(legal_only=False):
+            if move == hash_move:
+                continue
+            score = NodeAlphaBeta.get_static_order_score(game_state, move)
+            if heuristics is not None and board[move[1][0]][move[1][1]] == "NN":
+                score += heuristics.get_move_score(board, move, previous_move, ply)
+            scored_moves.append((score, move))
+
+        scored_moves.sort(key=lambda item: item[0], reverse=True)
+        for _, move in scored_moves:
+            yield move
 
 
 # ========== GAME TREE IMPLEMENTATIONS ==========
@@ -174,33 +918,93 @@ class NodeNegamax(NodeMinimax):
 class GameTreeAlphaBeta(GameTree):
     """GameTree using AlphaBeta++ with move ordering heuristics"""
 
-    def __init__(self, team, target_depth, value_pack: int = 0):
+    def __init__(
+        self, team, target_depth, value_pack: int = 0, time_budget_ms=SEARCH_TIME_BUDGET_MS
+    ):
         super().__init__(team, value_pack)
         self.target_depth = target_depth
+        self.time_budget_ms = time_budget_ms
+        self.heuristics = SearchHeuristics()
+        # Without a transposition table Lazy SMP gives way to root splitting
+        mode = "root_split" if PARALLEL_SEARCH_MODE == "lazy_smp" else PARALLEL_SEARCH_MODE
+        self.parallel_search = (
+            PARALLEL_SEARCH_MODES[mode](NUM_THREADS) if USE_MULTITHREADING else None
+        )
 
     def _create_node(self, game_state, parent, parent_move) -> NodeAlphaBeta:
         return NodeAlphaBeta(game_state, parent, parent_move)
 
-    def alphabeta_search(self, depth, alpha=-inf, beta=inf) -> float:
+    def _prepare_search(self) -> None:
+        """Age the search-wide move ordering tables and attach them to the root"""
+        self.heuristics.age()
+        self.current_node.heuristics = self.heuristics
+
+    def alphabeta_search(
+        self, depth, alpha=-GameState.INFINITE_SCORE, beta=GameState.INFINITE_SCORE
+    ) -> int:
         """Perform AlphaBeta search with enhanced move ordering"""
-        # Only sort if node has the method
-        if hasattr(self.current_node, 'sort_children_with_heuristic'):
-            self.current_node.sort_children_with_heuristic()
-        return self.current_node.minimax(depth, self.team is Team.RED, alpha, beta)
+        max_turn = self.current_node.game_state._current_team is Team.RED
+        return self.current_node.minimax(depth, max_turn, alpha, beta)
+
+    def can_ponder(self) -> bool:
+        """The pondered result is picked up by iterative deepening within a time budget
+        (the parallel searches have no table to carry it over)"""
+        return self.time_budget_ms is not None and self.parallel_search is None
+
+    def _search_to_depth(self, depth: int) -> int:
+        return self.alphabeta_search(depth)
+
+    def think(self, time_budget_ms=None, max_depth: int = GameTree.MAX_SEARCH_DEPTH) -> tuple:
+        """Iterative deepening, with the moves split between the worker
+        processes when multithreading is enabled"""
+        if self.parallel_search is None:
+            return super().think(time_budget_ms, max_depth)
+
+        self.ponder_result = None
+        return self.parallel_search.search(self, time_budget_ms, max_depth)
+
+    def search_node(self, node, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """Search a node of the tree found at the ply and return its value
+        seen from its side to move (for the parallel searches)"""
+        if node.game_state._current_team is Team.RED:
+            return node.minimax(depth, True, alpha, beta, ply)
+        return -node.minimax(depth, False, -beta, -alpha, ply)
+
+    def set_root_scores(self, scores: dict) -> int:
+        """Store the values of the root moves searched by the parallel searches,
+        {move: (value seen from the side to move, exact)}, in the root's children
+        (best first) and return the root value"""
+        root = self.current_node
+        sign = root.game_state._current_team.value
+        ranked = rank_root_scores(scores)
+        order = {move: index for index, (move, _) in enumerate(ranked)}
+        root.list_of_children.sort(key=lambda child: order[child.parent_move])
+        for child, (_, value) in zip(root.list_of_children, ranked):
+            child.minimax_value = sign * value
+        root.minimax_value = sign * ranked[0][1]
+        root.best_child_move = ranked[0][0]
+        return root.minimax_value
 
     def process(self, moves_queue) -> tuple:
         """Execute AlphaBeta++ algorithm"""
         start = time()
+        self._prepare_search()
 
-        # Perform search
-        self.alphabeta_search(self.target_depth)
+        if self.time_budget_ms is not None or self.parallel_search is not None:
+            # Iterative deepening within the time budget
+            (old_pos, new_pos), value, depth = self.think(self.time_budget_ms, self.target_depth)
+            self.move_to_child_node_with_move(old_pos, new_pos)
+            print(f"Depth: {depth}")
+        else:
+            # Perform search
+            value = self.alphabeta_search(self.target_depth)
 
-        # Get best move
-        old_pos, new_pos = self.move_to_best_child()
+            # Get best move
+            old_pos, new_pos = self.move_to_best_child()
         moves_queue.append((old_pos, new_pos))
 
         end = time()
-        print(f"AlphaBeta++ Value: {self.current_node.minimax_value}")
+        print(f"AlphaBeta++ Value: {GameState.score_to_str(value)}")
         print(f"Time: {end - start:.2f}s")
         print(f"{self.team.name} moves: {old_pos} -> {new_pos}")
 
@@ -210,91 +1014,226 @@ class GameTreeAlphaBeta(GameTree):
 class GameTreeNegamax(GameTree):
     """GameTree using Negamax with transposition table"""
 
-    def __init__(self, team, target_depth, value_pack: int = 0):
+    def __init__(
+        self, team, target_depth, value_pack: int = 0, time_budget_ms=SEARCH_TIME_BUDGET_MS
+    ):
         super().__init__(team, value_pack)
         self.target_depth = target_depth
+        self.time_budget_ms = time_budget_ms
+        self.heuristics = SearchHeuristics()
+        # Worker processes sharing a transposition table (started on the first search)
+        self.parallel_search = (
+            PARALLEL_SEARCH_MODES[PARALLEL_SEARCH_MODE](NUM_THREADS) if USE_MULTITHREADING else None
+        )
 
     def _create_node(self, game_state, parent, parent_move) -> NodeNegamax:
         return NodeNegamax(game_state, parent, parent_move)
 
+    def _prepare_search(self) -> None:
+        """Age the search-wide move ordering tables and the transposition table,
+        and attach the tables to the root"""
+        self.heuristics.age()
+        self.current_node.heuristics = self.heuristics
+        if transposition_table is not None:
+            transposition_table.new_search()
+
+    def can_ponder(self) -> bool:
+        """The pondered result is picked up by iterative deepening, within a time budget
+        or on the worker processes"""
+        return self.time_budget_ms is not None or self.parallel_search is not None
+
+    def _search_to_depth(self, depth: int) -> int:
+        return self.current_node.negamax(depth)
+
+    def think(self, time_budget_ms=None, max_depth: int = GameTree.MAX_SEARCH_DEPTH) -> tuple:
+        """Iterative deepening, on the worker processes when multithreading is enabled
+        (the shared table then carries over what pondering found)"""
+        if self.parallel_search is None:
+            return super().think(time_budget_ms, max_depth)
+
+        self.ponder_result = None
+        return self.parallel_search.search(self, time_budget_ms, max_depth)
+
+    def search_node(self, node, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """Search a node of the tree found at the ply and return its value
+        seen from its side to move (for the parallel searches)"""
+        return node.negamax(depth, alpha, beta, ply)
+
+    def set_root_scores(self, scores: dict) -> int:
+        """Store the values of the root moves searched by the parallel searches,
+        {move: (value seen from the side to move, exact)}, in the root's children
+        (best first) and return the root value"""
+        root = self.current_node
+        ranked = rank_root_scores(scores)
+        order = {move: index for index, (move, _) in enumerate(ranked)}
+        root.list_of_children.sort(key=lambda child: order[child.parent_move])
+        for child, (_, value) in zip(root.list_of_children, ranked):
+            child.minimax_value = -value
+        root.minimax_value = ranked[0][1]
+        root.best_child_move = ranked[0][0]
+        if isinstance(root, NodePVS):
+            root.best_child = root.list_of_children[0]
+        return root.minimax_value
+
     def process(self, moves_queue) -> tuple:
         """Execute Negamax algorithm"""
         start = time()
+        self._prepare_search()
 
-        # Perform Negamax search
-        value = self.current_node.negamax(self.target_depth)
+        if self.time_budget_ms is not None or self.parallel_search is not None:
+            # Iterative deepening within the time budget
+            (old_pos, new_pos), value, depth = self.think(self.time_budget_ms, self.target_depth)
+            self.move_to_child_node_with_move(old_pos, new_pos)
+            print(f"Depth: {depth}")
+        else:
+            # Perform Negamax search
+            value = self.current_node.negamax(self.target_depth)
 
-        # Get best move
-        old_pos, new_pos = self.move_to_best_child()
+            # Get best move
+            old_pos, new_pos = self.move_to_best_child()
         moves_queue.append((old_pos, new_pos))
 
         end = time()
-        print(f"Negamax Value: {value}")
+        print(f"Negamax Value: {GameState.score_to_str(value)}")
         print(f"Time: {end - start:.2f}s")
         print(f"{self.team.name} moves: {old_pos} -> {new_pos}")
 
         return old_pos, new_pos
 
 
-class GameTreeMTD(GameTree):
-    """GameTree using MTD(f) - Memory-enhanced Test Driver with Transposition Table"""
+class GameTreePVS(GameTreeNegamax):
+    """GameTree using Principal Variation Search with aspiration windows,
+    deepened iteratively so each iteration is centered on the previous score"""
 
-    def __init__(self, team, target_depth, value_pack: int = 0):
-        super().__init__(team, value_pack)
-        self.target_depth = target_depth
+    # Initial half-width of the aspiration window (half a pawn)
+    ASPIRATION_WINDOW = 5 * GameState.SCORE_SCALE
+    # Beyond this half-width the window is opened completely
+    MAX_ASPIRATION_WINDOW = 8 * ASPIRATION_WINDOW
 
-    def _create_node(self, game_state, parent, parent_move) -> NodeNegamax:
-        return NodeNegamax(game_state, parent, parent_move)
+    def __init__(
+        self, team, target_depth, value_pack: int = 0, time_budget_ms=SEARCH_TIME_BUDGET_MS
+    ):
+        super().__init__(team, target_depth, value_pack, time_budget_ms)
+        self.previous_value = None
+
+    def _create_node(self, game_state, parent, parent_move) -> NodePVS:
+        return NodePVS(game_state, parent, parent_move)
+
+    def aspiration_search(self, depth: int, guess: int) -> int:
+        """Search the root with a window around the guess, widening it on failure"""
+        delta = self.ASPIRATION_WINDOW
+        alpha, beta = guess - delta, guess + delta
 
-    def negamax_with_bounds(self, depth, bound, alpha=-inf, beta=inf):
-        """Negamax with specific bound"""
-        if beta <= alpha:
-            beta = alpha + 1
+        while True:
+            value = self.current_node.negamax(depth, alpha, beta)
 
-        board_hash = hash(tuple(map(tuple, self.current_node.game_state.board)))
-        result = self.current_node.negamax(depth, alpha, beta)
+            if alpha < value < beta:
+                return value
 
-        if result < bound:
-            return result
+            delta *= 2
+            if delta > self.MAX_ASPIRATION_WINDOW:
+                return self.current_node.negamax(depth)
+            if value <= alpha:
+                alpha = max(value - delta, -GameState.INFINITE_SCORE)
+            else:
+                beta = min(value + delta, GameState.INFINITE_SCORE)
+
+    def can_ponder(self) -> bool:
+        """Every move is searched by iterative deepening"""
+        return True
+
+    def _search_to_depth(self, depth: int) -> int:
+        # Mate scores are not worth guessing around
+        if self.previous_value is None or abs(self.previous_value) >= GameState.MATE_THRESHOLD:
+            value = self.current_node.negamax(depth)
         else:
-            return result
+            value = self.aspiration_search(depth, self.previous_value)
+
+        self.previous_value = value
+        return value
+
+    def process(self, moves_queue) -> tuple:
+        """Execute PVS algorithm"""
+        start = time()
+        self._prepare_search()
+
+        self.previous_value = None
+        (old_pos, new_pos), value, depth = self.think(self.time_budget_ms, self.target_depth)
+        self.move_to_child_node_with_move(old_pos, new_pos)
+        moves_queue.append((old_pos, new_pos))
+
+        end = time()
+        print(f"PVS Value: {GameState.score_to_str(value)} (depth {depth})")
+        print(f"Time: {end - start:.2f}s")
+        print(f"{self.team.name} moves: {old_pos} -> {new_pos}")
+
+        return old_pos, new_pos
+
+
+class GameTreeMTD(GameTreeNegamax):
+    """GameTree using MTD(f) - Memory-enhanced Test Driver with Transposition Table.
+    Every search is a null-window probe; the transposition table keeps the
+    lower and upper bounds they prove, so repeated probes stay cheap"""
+
+    def __init__(
+        self, team, target_depth, value_pack: int = 0, time_budget_ms=SEARCH_TIME_BUDGET_MS
+    ):
+        super().__init__(team, target_depth, value_pack, time_budget_ms)
+        self.previous_value = None
+
+    def _create_node(self, game_state, parent, parent_move) -> NodePVS:
+        # With a null window PVS searches like Negamax, and keeps the child that failed high
+        return NodePVS(game_state, parent, parent_move)
 
     def mtdf(self, depth, first_guess=0):
-        """MTD(f) algorithm - converges to exact value with multiple searches"""
-        upper_bound = inf
-        lower_bound = -inf
+        """MTD(f) algorithm - converges to exact value with null-window searches"""
+        upper_bound = GameState.INFINITE_SCORE
+        lower_bound = -GameState.INFINITE_SCORE
         guess = first_guess
-        iterations = 0
+        best_child = None
+        root = self.current_node
 
-        start_time = time()
-        while lower_bound < upper_bound and iterations < 3:  # Limit iterations
-            beta = guess if guess == lower_bound else guess + 1
+        while lower_bound < upper_bound:
+            beta = max(guess, lower_bound + 1)
 
-            g = self.negamax_with_bounds(depth, beta, lower_bound, upper_bound)
+            guess = root.negamax(depth, beta - 1, beta)
 
-            if g < beta:
-                upper_bound = g
+            if guess < beta:
+                upper_bound = guess
             else:
-                lower_bound = g
-
-            guess = g
-            iterations += 1
+                lower_bound = guess
+                # Only a fail-high proves the move that reaches the value
+                best_child = root.best_child
 
+        if best_child is not None:
+            root.best_child = best_child
+        root.minimax_value = guess
         return guess
 
+    def can_ponder(self) -> bool:
+        """Every move is searched by iterative deepening"""
+        return True
+
+    def _search_to_depth(self, depth: int) -> int:
+        # Each iteration starts from the value of the previous one
+        first_guess = 0 if self.previous_value is None else self.previous_value
+        value = self.mtdf(depth, first_guess)
+        self.previous_value = value
+        return value
+
     def process(self, moves_queue) -> tuple:
         """Execute MTD(f) algorithm"""
         start = time()
+        self._prepare_search()
 
-        # Perform MTD(f) search
-        value = self.mtdf(self.target_depth)
-
-        # Get best move
-        old_pos, new_pos = self.move_to_best_child()
+        # Perform MTD(f) search, deepened iteratively
+        self.previous_value = None
+        (old_pos, new_pos), value, depth = self.think(self.time_budget_ms, self.target_depth)
+        self.move_to_child_node_with_move(old_pos, new_pos)
         moves_queue.append((old_pos, new_pos))
 
         end = time()
-        print(f"MTD(f) Value: {value}")
+        print(f"MTD(f) Value: {GameState.score_to_str(value)} (depth {depth})")
         print(f"Time: {end - start:.2f}s")
         print(f"{self.team.name} moves: {old_pos} -> {new_pos}")
 
@@ -336,17 +1275,19 @@ class GameTreeHybrid(GameTree):
 
         if self.should_use_minimax():
             print("Using AlphaBeta++ for this position...")
-            self.minimax_engine.current_node = self.current_node
-            old_pos, new_pos = self.minimax_engine.process(moves_queue)
+            engine = self.minimax_engine
         elif self.mcts_engine:
             print("Using MCTS for this position...")
-            self.mcts_engine.current_node = self.current_node
-            old_pos, new_pos = self.mcts_engine.process(moves_queue)
+            engine = self.mcts_engine
         else:
             # Fallback to minimax if MCTS not available
             print("Fallback to AlphaBeta++")
-            self.minimax_engine.current_node = self.current_node
-            old_pos, new_pos = self.minimax_engine.process(moves_queue)
+            engine = self.minimax_engine
+
+        engine.current_node = self.current_node
+        old_pos, new_pos = engine.process(moves_queue)
+        # Carry on from the node the engine moved to, with its searched subtree
+        self.current_node = engine.current_node
 
         end = time()
         print(f"Hybrid Algorithm Time: {end - start:.2f}s")
@@ -85,6 +85,18 @@ ALGORITHM_CONFIGS = {
         "max_depth": 8,
         "requires_tt": True,
     },
+    "PVS": {
+        "display_name": "PVS (Principal Variation Search)",
+        "description": "Null-window search of non-PV moves with aspiration windows",
+        "recommended_depth": 5,
+        "memory_usage": "High",
+        "speed": "5/5",
+        "quality": "4/5",
+        "best_for": "Deep searches, stable positions",
+        "min_depth": 4,
+        "max_depth": 8,
+        "requires_tt": True,
+    },
     "MTD(f)": {
         "display_name": "MTD(f) (Optimal Search)",
         "description": "Converges to exact value with null windows",
@@ -133,6 +145,11 @@ VALUE_PACK_DESCRIPTIONS = {
         "description": "Complex evaluation with game phase & piece synergy",
         "use_case": "All positions",
     },
+    3: {
+        "name": "Tapered Evaluation",
+        "description": "Opening/endgame piece-square tables blended by game phase",
+        "use_case": "All positions, fast",
+    },
 }
 
 # ========== RECOMMENDED SETUPS ==========
@@ -251,11 +268,16 @@ HEURISTIC_CONFIG = {
         "enabled": True,
         "initial_value": 0,
         "update_on_cutoff": True,
+        "max_value": 8000,  # Halve the table past this (below capture scores)
+    },
+    "countermoves": {
+        "enabled": True,
+        "weight": 800,
     },
     "transposition_table": {
         "enabled": True,
-        "size_entries": 1000000,
-        "replacement_strategy": "always",  # always, depth, new
+        "size_mb": 16,  # Rounded down to a power-of-two number of buckets
+        "replacement_strategy": "depth",  # always, depth, new
     },
     "move_ordering": {
         "captures_first": True,
@@ -264,6 +286,24 @@ HEURISTIC_CONFIG = {
     },
 }
 
+# ========== LATE MOVE REDUCTIONS ==========
+
+LMR_CONFIG = {
+    "enabled": True,
+    "min_depth": 3,  # Never reduce with less depth left
+    "history_threshold": 4000,  # Quiet moves with at least this history are reduced one ply less
+    # Move number (in search order, from 0) from which each column applies
+    "move_number_columns": [3, 6, 12, 24],
+    # Reduction in plies, one row per depth left from min_depth (the last row for deeper)
+    "reduction_table": [
+        [1, 1, 1, 1],  # depth 3
+        [1, 1, 2, 2],  # depth 4
+        [1, 2, 2, 2],  # depth 5
+        [1, 2, 2, 3],  # depth 6
+        [2, 2, 3, 3],  # depth 7+
+    ],
+}
+
 # ========== DEBUGGING & MONITORING ==========
 
 MONITORING_CONFIG = {
@@ -290,6 +330,7 @@ def get_estimated_time(algorithm, depth):
         "Minimax": 0.5,
         "AlphaBeta++": 0.8,
         "Negamax": 1.0,
+        "PVS": 0.8,
         "MTD(f)": 2.0,
         "Hybrid": 1.5,
         "MCTS": 2.0,  # per second
@@ -0,0 +1,324 @@
+"""
+Tapered Evaluation Tables for Chinese Chess AI
+Precomputed opening/endgame weights used by value pack 3
+"""
+
+import json
+import os
+from optimization_config import TUNED_VALUE_PACK_FILE
+
+# Centipawns per weight unit (the weights below use pawn = 10)
+SCORE_SCALE = 10
+
+# ========== GAME PHASE ==========
+
+# Phase contribution of each piece type (pawns and generals do not count)
+PHASE_WEIGHTS = {
+    "R": 6,
+    "H": 3,
+    "C": 3,
+    "A": 1,
+    "E": 1,
+    "P": 0,
+    "G": 0,
+}
+
+# Phase of the initial position (2 teams x (2R + 2H + 2C + 2A + 2E))
+MAX_PHASE = 2 * 2 * (
+    PHASE_WEIGHTS["R"] + PHASE_WEIGHTS["H"] + PHASE_WEIGHTS["C"]
+    + PHASE_WEIGHTS["A"] + PHASE_WEIGHTS["E"]
+)
+
+# ========== MATERIAL ==========
+
+MATERIAL_MG = {"R": 90, "H": 40, "C": 45, "E": 25, "A": 20, "P": 10, "G": 0}
+MATERIAL_EG = {"R": 100, "H": 45, "C": 40, "E": 20, "A": 20, "P": 20, "G": 0}
+
+# ========== THREATS ==========
+
+# Percentage of the largest value at risk charged to the side that just moved
+HANGING_PIECE_WEIGHT = 50
+
+# ========== PIECE-SQUARE TABLES ==========
+# Every table is written from the red side's point of view:
+# row 0 is black's back rank, row 9 is red's back rank.
+
+PST_MG = {
+    "R": [
+        [6, 8, 7, 13, 14, 13, 7, 8, 6],
+        [6, 12, 9, 16, 33, 16, 9, 12, 6],
+        [6, 8, 7, 14, 16, 14, 7, 8, 6],
+        [6, 13, 13, 16, 16, 16, 13, 13, 6],
+        [8, 11, 11, 14, 15, 14, 11, 11, 8],
+        [8, 12, 12, 14, 15, 14, 12, 12, 8],
+        [4, 9, 4, 12, 14, 12, 4, 9, 4],
+        [-2, 8, 4, 12, 12, 12, 4, 8, -2],
+        [5, 8, 6, 12, 0, 12, 6, 8, 5],
+        [-6, 6, 4, 12, 0, 12, 4, 6, -6],
+    ],
+    "H": [
+        [2, 2, 2, 8, 2, 8, 2, 2, 2],
+        [2, 8, 15, 9, 6, 9, 15, 8, 2],
+        [4, 10, 11, 15, 11, 15, 11, 10, 4],
+        [5, 20, 12, 19, 12, 19, 12, 20, 5],
+        [2, 12, 11, 15, 16, 15, 11, 12, 2],
+        [2, 10, 13, 14, 15, 14, 13, 10, 2],
+        [4, 6, 10, 7, 10, 7, 10, 6, 4],
+        [5, 4, 6, 7, 4, 7, 6, 4, 5],
+        [-3, 2, 4, 5, -10, 5, 4, 2, -3],
+        [0, -3, 2, 0, 2, 0, 2, -3, 0],
+    ],
+    "C": [
+        [4, 4, 0, -5, -6, -5, 0, 4, 4],
+        [2, 2, 0, -4, -7, -4, 0, 2, 2],
+        [1, 1, 0, -5, -4, -5, 0, 1, 1],
+        [0, 3, 3, 2, 4, 2, 3, 3, 0],
+        [0, 0, 0, 0, 4, 0, 0, 0, 0],
+        [-1, 0, 3, 0, 4, 0, 3, 0, -1],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [1, 0, 4, 3, 5, 3, 4, 0, 1],
+        [0, 1, 2, 2, 2, 2, 2, 1, 0],
+        [0, 0, 1, 3, 3, 3, 1, 0, 0],
+    ],
+    "E": [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, -2, 0, 0, 0, -2, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [-2, 0, 0, 0, 3, 0, 0, 0, -2],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+    ],
+    "A": [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, -1, 0, -1, 0, 0, 0],
+        [0, 0, 0, 0, 3, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+    ],
+    "P": [
+        [0, 0, 0, 2, 4, 2, 0, 0, 0],
+        [4, 6, 10, 14, 16, 14, 10, 6, 4],
+        [4, 6, 10, 12, 14, 12, 10, 6, 4],
+        [2, 4, 6, 8, 10, 8, 6, 4, 2],
+        [1, 2, 4, 6, 8, 6, 4, 2, 1],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, -1, 0, 2, 0, -1, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+    ],
+    "G": [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, -8, -9, -8, 0, 0, 0],
+        [0, 0, 0, -4, -5, -4, 0, 0, 0],
+        [0, 0, 0, 1, 5, 1, 0, 0, 0],
+    ],
+}
+
+PST_EG = {
+    "R": [
+        [10, 10, 10, 12, 12, 12, 10, 10, 10],
+        [10, 12, 12, 14, 16, 14, 12, 12, 10],
+        [8, 10, 10, 12, 12, 12, 10, 10, 8],
+        [6, 8, 8, 10, 10, 10, 8, 8, 6],
+        [6, 8, 8, 10, 10, 10, 8, 8, 6],
+        [6, 8, 8, 10, 10, 10, 8, 8, 6],
+        [4, 6, 6, 8, 8, 8, 6, 6, 4],
+        [2, 4, 4, 6, 6, 6, 4, 4, 2],
+        [0, 2, 2, 4, 4, 4, 2, 2, 0],
+        [0, 0, 2, 4, 4, 4, 2, 0, 0],
+    ],
+    "H": [
+        [0, 2, 4, 6, 6, 6, 4, 2, 0],
+        [2, 6, 10, 12, 12, 12, 10, 6, 2],
+        [4, 8, 12, 14, 14, 14, 12, 8, 4],
+        [4, 8, 12, 14, 16, 14, 12, 8, 4],
+        [2, 6, 10, 12, 14, 12, 10, 6, 2],
+        [2, 6, 8, 10, 12, 10, 8, 6, 2],
+        [0, 4, 6, 8, 8, 8, 6, 4, 0],
+        [0, 2, 4, 6, 6, 6, 4, 2, 0],
+        [-2, 0, 2, 2, 0, 2, 2, 0, -2],
+        [-4, -2, 0, 0, 0, 0, 0, -2, -4],
+    ],
+    "C": [
+        [2, 2, 2, 4, 6, 4, 2, 2, 2],
+        [2, 2, 2, 4, 6, 4, 2, 2, 2],
+        [0, 0, 0, 2, 4, 2, 0, 0, 0],
+        [0, 0, 0, 2, 4, 2, 0, 0, 0],
+        [0, 0, 0, 2, 4, 2, 0, 0, 0],
+        [0, 0, 0, 2, 4, 2, 0, 0, 0],
+        [0, 0, 0, 2, 4, 2, 0, 0, 0],
+        [0, 0, 0, 2, 4, 2, 0, 0, 0],
+        [0, 0, 0, 0, 2, 0, 0, 0, 0],
+        [0, 0, 0, 0, 2, 0, 0, 0, 0],
+    ],
+    "E": [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 2, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+    ],
+    "A": [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 2, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+    ],
+    "P": [
+        [0, 0, 2, 4, 6, 4, 2, 0, 0],
+        [6, 10, 14, 18, 20, 18, 14, 10, 6],
+        [6, 10, 12, 16, 18, 16, 12, 10, 6],
+        [4, 8, 10, 12, 14, 12, 10, 8, 4],
+        [2, 4, 6, 8, 10, 8, 6, 4, 2],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+    ],
+    "G": [
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 2, 4, 2, 0, 0, 0],
+        [0, 0, 0, 0, 2, 0, 0, 0, 0],
+        [0, 0, 0, -2, 0, -2, 0, 0, 0],
+    ],
+}
+
+
+# ========== PRECOMPUTED LOOKUP TABLES ==========
+
+def _build_signed_tables(material: dict, pst: dict) -> dict:
+    """Build the notation -> 10x9 table of signed centipawn values (positive for red),
+    mirroring the red point of view tables for black"""
+    tables = dict()
+    for piece_type, value in material.items():
+        red_table = [
+            [round((value + pst[piece_type][x][y]) * SCORE_SCALE) for y in range(9)]
+            for x in range(10)
+        ]
+        black_table = [
+            [-round((value + pst[piece_type][9 - x][y]) * SCORE_SCALE) for y in range(9)]
+            for x in range(10)
+        ]
+        tables["R" + piece_type] = red_table
+        tables["B" + piece_type] = black_table
+    return tables
+
+
+def build_tables() -> None:
+    """(Re)build the precomputed lookup tables from the weight tables above"""
+    global MG_TABLE, EG_TABLE, PHASE_TABLE
+    MG_TABLE = _build_signed_tables(MATERIAL_MG, PST_MG)
+    EG_TABLE = _build_signed_tables(MATERIAL_EG, PST_EG)
+    PHASE_TABLE = {"NN": 0}
+    for piece_type, weight in PHASE_WEIGHTS.items():
+        PHASE_TABLE["R" + piece_type] = weight
+        PHASE_TABLE["B" + piece_type] = weight
+
+
+def load_tables(path: str) -> None:
+    """Load tuned material and piece-square weights from a JSON file
+    (as written by tuning.py) and rebuild the lookup tables"""
+    with open(path) as f:
+        tables = json.load(f)
+
+    MATERIAL_MG.update(tables["material_mg"])
+    MATERIAL_EG.update(tables["material_eg"])
+    PST_MG.update(tables["pst_mg"])
+    PST_EG.update(tables["pst_eg"])
+    build_tables()
+
+
+def save_tables(path: str, material_mg, material_eg, pst_mg, pst_eg) -> None:
+    """Write material and piece-square weights to a JSON file"""
+    with open(path, "w") as f:
+        json.dump(
+            {
+                "material_mg": material_mg,
+                "material_eg": material_eg,
+                "pst_mg": pst_mg,
+                "pst_eg": pst_eg,
+            },
+            f,
+            indent=1,
+        )
+
+
+MG_TABLE, EG_TABLE, PHASE_TABLE = None, None, None
+if os.path.exists(TUNED_VALUE_PACK_FILE):
+    load_tables(TUNED_VALUE_PACK_FILE)
+else:
+    build_tables()
+
+
+# ========== EVALUATION FUNCTIONS ==========
+
+def get_tapered_scores(board: list) -> tuple:
+    """Return the (opening score, endgame score, phase) of a board from scratch"""
+    mg_score, eg_score, phase = 0, 0, 0
+    for x in range(10):
+        for y in range(9):
+            notation = board[x][y]
+            if notation == "NN":
+                continue
+            mg_score += MG_TABLE[notation][x][y]
+            eg_score += EG_TABLE[notation][x][y]
+            phase += PHASE_TABLE[notation]
+    return mg_score, eg_score, phase
+
+
+def update_tapered_scores(
+    scores: tuple, moved: str, captured: str, old_pos: tuple, new_pos: tuple
+) -> tuple:
+    """Return the tapered scores after a move, given the scores before it"""
+    mg_score, eg_score, phase = scores
+    mg_table, eg_table = MG_TABLE[moved], EG_TABLE[moved]
+    mg_score += mg_table[new_pos[0]][new_pos[1]] - mg_table[old_pos[0]][old_pos[1]]
+    eg_score += eg_table[new_pos[0]][new_pos[1]] - eg_table[old_pos[0]][old_pos[1]]
+
+    if captured != "NN":
+        mg_score -= MG_TABLE[captured][new_pos[0]][new_pos[1]]
+        eg_score -= EG_TABLE[captured][new_pos[0]][new_pos[1]]
+        phase -= PHASE_TABLE[captured]
+
+    return mg_score, eg_score, phase
+
+
+def blend(scores: tuple) -> int:
+    """Blend the opening and endgame scores by the game phase (in centipawns)"""
+    mg_score, eg_score, phase = scores
+    phase = min(phase, MAX_PHASE)
+    return (mg_score * phase + eg_score * (MAX_PHASE - phase)) // MAX_PHASE
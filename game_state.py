@@ -1,10 +1,23 @@
 # Made by: Veil
 """Module providing the property of game state"""
-from cmath import inf
-from random import shuffle
+from random import shuffle, Random
 from functools import lru_cache
 from piece import General, Piece
 from team import Team
+from threat import get_threat_analysis, THREAT_PIECE_VALUES
+import evaluation
+
+
+def _generate_zobrist_keys() -> dict:
+    """Return the 64-bit Zobrist keys of every (notation, position)"""
+    rng = Random(20240601)
+    keys = dict()
+    for team in ("R", "B"):
+        for piece_type in ("A", "C", "E", "G", "H", "P", "R"):
+            keys[team + piece_type] = [
+                [rng.getrandbits(64) for _ in range(9)] for _ in range(10)
+            ]
+    return keys
 
 
 class GameState:
@@ -17,6 +30,14 @@ class GameState:
     BOARD_SIZE_Y = 9
     # Limit for repeated moves
     MAX_PERPETUAL = 3
+    # Scores (integer centipawns, positive for red)
+    SCORE_SCALE = evaluation.SCORE_SCALE
+    MATE_SCORE = 100000
+    MATE_THRESHOLD = MATE_SCORE - 1000
+    INFINITE_SCORE = MATE_SCORE + 1
+    # Zobrist hashing keys
+    ZOBRIST_KEYS = _generate_zobrist_keys()
+    ZOBRIST_BLACK_TO_MOVE = Random(20240602).getrandbits(64)
 
     # [BEGIN INITILIZATION]
     def __init__(
@@ -27,6 +48,8 @@ class GameState:
         value_pack: int = 0,
         number_of_red_pieces: int = 16,
         number_of_black_pieces: int = 16,
+        tapered_scores: tuple = None,
+        position_hash: int = None,
     ) -> None:
         self.board = board
         self.move_history = move_history
@@ -38,13 +61,16 @@ class GameState:
         self._current_team = current_team
         self._all_child_gamestates = None
         self._board_hash = None
+        self._tapered_scores = tapered_scores
+        self._position_hash = position_hash
+        self._is_in_check = None
 
     # Properties initialization
     # .value
     @property
-    def value(self) -> float:
+    def value(self) -> int:
         """This is the Getter function of the value property,
-        return the value of the game state using chess pieces value"""
+        return the value of the game state using chess pieces value (in centipawns)"""
 
         if self._value is None:
             self._value = self._get_game_state_value()
@@ -61,18 +87,59 @@ class GameState:
 
         return self._all_child_gamestates
 
+    # .tapered_scores
+    @property
+    def tapered_scores(self) -> tuple:
+        """This is the Getter function of the (opening, endgame, phase) scores,
+        which are maintained incrementally from the parent game state"""
+
+        if self._tapered_scores is None:
+            self._tapered_scores = evaluation.get_tapered_scores(self.board)
+
+        return self._tapered_scores
+
+    # .position_hash
+    @property
+    def position_hash(self) -> int:
+        """This is the Getter function of the Zobrist hash of the position
+        (board and side to move), maintained incrementally from the parent"""
+
+        if self._position_hash is None:
+            self._position_hash = self.zobrist_hash(self.board, self._current_team)
+
+        return self._position_hash
+
+    # .threats
+    @property
+    def threats(self):
+        """This is the Getter function of the threat analysis of the position
+        (attack map and hanging pieces), cached by position hash"""
+
+        return get_threat_analysis(self.board, self.position_hash)
+
     # [END INITILIZATION]
 
     # [BEGIN METHOD]
     # Instance method
-    def _get_game_state_value(self) -> float:
+    def _get_game_state_value(self) -> int:
         """Return the evaluation value of the board"""
         # Return the value of a game state when a team wins
-        if self.get_team_win() is Team.RED:
-            return inf
-
-        if self.get_team_win() is Team.BLACK:
-            return -inf
+        winning_team = self.get_team_win()
+        if winning_team is Team.RED:
+            return self.MATE_SCORE
+
+        if winning_team is Team.BLACK:
+            return -self.MATE_SCORE
+
+        # Value pack 3: blend the incrementally maintained tapered scores
+        # and charge the side that just moved for its most valuable hanging piece
+        if self._value_pack == 3:
+            value = evaluation.blend(self.tapered_scores)
+            if evaluation.HANGING_PIECE_WEIGHT > 0:
+                mover = self._get_the_opponent_team()
+                risk = self.threats.max_hanging_value(mover)
+                value -= mover.value * risk * evaluation.HANGING_PIECE_WEIGHT // 100
+            return value
 
         current_value = 0
         # Iterate through all the positions on the board
@@ -94,7 +161,7 @@ class GameState:
                 )
                 current_value += piece.piece_value(self._value_pack) * piece.team.value
 
-        return current_value
+        return round(current_value * self.SCORE_SCALE)
 
     def _get_the_opponent_team(self) -> Team:
         """This method returns the opponent's team in the game state"""
@@ -154,6 +221,24 @@ class GameState:
             else:
                 new_number_of_red_pieces -= 1
 
+        # Update the Zobrist hash incrementally
+        moved_keys = self.ZOBRIST_KEYS[old_pos_notation]
+        new_position_hash = (
+            self.position_hash
+            ^ moved_keys[old_pos[0]][old_pos[1]]
+            ^ moved_keys[new_pos[0]][new_pos[1]]
+            ^ self.ZOBRIST_BLACK_TO_MOVE
+        )
+        if new_pos_notation != "NN":
+            new_position_hash ^= self.ZOBRIST_KEYS[new_pos_notation][new_pos[0]][new_pos[1]]
+
+        # Update the tapered scores incrementally for value pack 3
+        new_tapered_scores = None
+        if self._value_pack == 3:
+            new_tapered_scores = evaluation.update_tapered_scores(
+                self.tapered_scores, old_pos_notation, new_pos_notation, old_pos, new_pos
+            )
+
         return GameState(
             new_board,
             opponent,
@@ -161,8 +246,208 @@ class GameState:
             self._value_pack,
             new_number_of_red_pieces,
             new_number_of_black_pieces,
+            new_tapered_scores,
+            new_position_hash,
         ), (old_pos, new_pos)
 
+    def generate_game_state_with_stored_move(self, old_pos: tuple, new_pos: tuple):
+        """This method creates a game state with a move that was not generated here
+        (e.g. read from the transposition table), after checking the move is admissible
+        (return None if it is not)"""
+        if not self.is_move_admissible(old_pos, new_pos):
+            return None
+
+        return self.generate_game_state_with_move(old_pos, new_pos)
+
+    def is_move_admissible(self, old_pos: tuple, new_pos: tuple) -> bool:
+        """This method returns True if the current team's piece on old_pos
+        can move to new_pos (the move is not checked for legality)"""
+        notation = self.board[old_pos[0]][old_pos[1]]
+        if notation == "NN" or Team[notation[0]] is not self._current_team:
+            return False
+
+        piece = Piece.create_instance(
+            old_pos,
+            notation,
+            self.board,
+            self.number_of_black_pieces + self.number_of_red_pieces,
+            self._get_number_of_team_pieces(self._current_team),
+        )
+        return new_pos in piece.admissible_moves
+
+    def is_move_legal(self, old_pos: tuple, new_pos: tuple) -> bool:
+        """This method returns True if an admissible move neither exposes
+        the current team's general nor repeats a position too often"""
+        old_pos_notation = self.board[old_pos[0]][old_pos[1]]
+        new_pos_notation = self.board[new_pos[0]][new_pos[1]]
+        self.board[old_pos[0]][old_pos[1]] = "NN"
+        self.board[new_pos[0]][new_pos[1]] = old_pos_notation
+
+        legal = (
+            self.move_history.get(self.hash_board(self.board), 0) + 1 != self.MAX_PERPETUAL
+            and General.is_general_exposed(
+                self.board, self._current_team, self._get_the_opponent_team()
+            ) is False
+        )
+
+        self.board[old_pos[0]][old_pos[1]] = old_pos_notation
+        self.board[new_pos[0]][new_pos[1]] = new_pos_notation
+        return legal
+
+    def generate_moves(self, legal_only: bool = True) -> list:
+        """This method returns the moves of the current team as (old_pos, new_pos),
+        without creating their game states (legal_only=False leaves the legality
+        check to the caller, see is_move_legal)"""
+        moves = list()
+        total_pieces = self.number_of_black_pieces + self.number_of_red_pieces
+
+        for i in range(self.BOARD_SIZE_X):
+            for j in range(self.BOARD_SIZE_Y):
+                notation = self.board[i][j]
+                if notation == "NN" or Team[notation[0]] is not self._current_team:
+                    continue
+
+                moves_list = Piece.create_instance(
+                    (i, j),
+                    notation,
+                    self.board,
+                    total_pieces,
+                    self._get_number_of_team_pieces(self._current_team),
+                ).admissible_moves
+                for new_pos in moves_list:
+                    if not legal_only or self.is_move_legal((i, j), new_pos):
+                        moves.append(((i, j), new_pos))
+
+        return moves
+
+    def make_move(self, old_pos: tuple, new_pos: tuple) -> tuple:
+        """This method plays a legal move on this game state in place (searches walk
+        a single position this way) and returns what unmake_move needs to take it back"""
+        old_pos_notation = self.board[old_pos[0]][old_pos[1]]
+        new_pos_notation = self.board[new_pos[0]][new_pos[1]]
+        undo = (
+            old_pos,
+            new_pos,
+            new_pos_notation,
+            self.number_of_red_pieces,
+            self.number_of_black_pieces,
+            self._value,
+            self._all_child_gamestates,
+            self._board_hash,
+            self._tapered_scores,
+            self._position_hash,
+            self._is_in_check,
+        )
+
+        # Incremental hash and tapered scores, from the position before the move
+        moved_keys = self.ZOBRIST_KEYS[old_pos_notation]
+        position_hash = (
+            self.position_hash
+            ^ moved_keys[old_pos[0]][old_pos[1]]
+            ^ moved_keys[new_pos[0]][new_pos[1]]
+            ^ self.ZOBRIST_BLACK_TO_MOVE
+        )
+        if new_pos_notation != "NN":
+            position_hash ^= self.ZOBRIST_KEYS[new_pos_notation][new_pos[0]][new_pos[1]]
+            if self._current_team is Team.RED:
+                self.number_of_black_pieces -= 1
+            else:
+                self.number_of_red_pieces -= 1
+        if self._value_pack == 3:
+            self._tapered_scores = evaluation.update_tapered_scores(
+                self.tapered_scores, old_pos_notation, new_pos_notation, old_pos, new_pos
+            )
+        else:
+            self._tapered_scores = None
+
+        self.board[old_pos[0]][old_pos[1]] = "NN"
+        self.board[new_pos[0]][new_pos[1]] = old_pos_notation
+        hash_code = self.hash_board(self.board)
+        self.move_history[hash_code] = self.move_history.get(hash_code, 0) + 1
+
+        self._current_team = self._get_the_opponent_team()
+        self._position_hash = position_hash
+        self._value = None
+        self._all_child_gamestates = None
+        self._board_hash = None
+        self._is_in_check = None
+        return undo
+
+    def make_null_move(self) -> tuple:
+        """This method passes the turn in place and returns what unmake_move needs"""
+        undo = (
+            None,
+            None,
+            None,
+            self.number_of_red_pieces,
+            self.number_of_black_pieces,
+            self._value,
+            self._all_child_gamestates,
+            self._board_hash,
+            self._tapered_scores,
+            self._position_hash,
+            self._is_in_check,
+        )
+        self._position_hash = self.position_hash ^ self.ZOBRIST_BLACK_TO_MOVE
+        self._current_team = self._get_the_opponent_team()
+        self._value = None
+        self._all_child_gamestates = None
+        self._is_in_check = None
+        return undo
+
+    def unmake_move(self, undo: tuple) -> None:
+        """This method takes back the move (or null move) that returned undo"""
+        (
+            old_pos,
+            new_pos,
+            new_pos_notation,
+            self.number_of_red_pieces,
+            self.number_of_black_pieces,
+            self._value,
+            self._all_child_gamestates,
+            self._board_hash,
+            self._tapered_scores,
+            self._position_hash,
+            self._is_in_check,
+        ) = undo
+
+        if old_pos is not None:
+            hash_code = self.hash_board(self.board)
+            count = self.move_history[hash_code] - 1
+            if count:
+                self.move_history[hash_code] = count
+            else:
+                del self.move_history[hash_code]
+
+            self.board[old_pos[0]][old_pos[1]] = self.board[new_pos[0]][new_pos[1]]
+            self.board[new_pos[0]][new_pos[1]] = new_pos_notation
+
+        self._current_team = self._get_the_opponent_team()
+
+    def generate_null_move_game_state(self):
+        """This method returns the game state where the current team passes:
+        the board is shared, only the side to move and the hash change"""
+        return GameState(
+            self.board,
+            self._get_the_opponent_team(),
+            self.move_history,
+            self._value_pack,
+            self.number_of_red_pieces,
+            self.number_of_black_pieces,
+            self._tapered_scores,
+            self.position_hash ^ self.ZOBRIST_BLACK_TO_MOVE,
+        )
+
+    def count_major_pieces(self, team: Team) -> int:
+        """This method returns the number of rooks, horses and cannons of a team"""
+        letter = team.name[0]
+        return sum(
+            1
+            for row in self.board
+            for notation in row
+            if notation[0] == letter and notation[1] in "RHC"
+        )
+
     def generate_random_game_state(self):
         """This method generates another gamestate that can be tranformed
         by the current method using each move of the piece"""
@@ -241,6 +526,44 @@ class GameState:
 
         return game_states_available
 
+    def generate_capture_moves(self) -> list:
+        """This method returns the captures of the current team as (old_pos, new_pos)
+        moves, most valuable victim / least valuable attacker first.
+        The moves are not checked for legality"""
+        capture_moves = list()
+        total_pieces = self.number_of_black_pieces + self.number_of_red_pieces
+        opponent_letter = self._get_the_opponent_team().name[0]
+
+        for i in range(self.BOARD_SIZE_X):
+            for j in range(self.BOARD_SIZE_Y):
+                notation = self.board[i][j]
+                if notation == "NN" or Team[notation[0]] is not self._current_team:
+                    continue
+
+                moves_list = Piece.create_instance(
+                    (i, j),
+                    notation,
+                    self.board,
+                    total_pieces,
+                    self._get_number_of_team_pieces(self._current_team),
+                ).admissible_moves
+                for new_pos in moves_list:
+                    victim = self.board[new_pos[0]][new_pos[1]]
+                    if victim[0] == opponent_letter:
+                        order = 16 * THREAT_PIECE_VALUES[victim[1]] - THREAT_PIECE_VALUES[notation[1]]
+                        capture_moves.append((order, (i, j), new_pos))
+
+        capture_moves.sort(key=lambda item: item[0], reverse=True)
+        return [(old_pos, new_pos) for _, old_pos, new_pos in capture_moves]
+
+    def is_in_check(self) -> bool:
+        """This method returns True if the current team's general is attacked"""
+        if self._is_in_check is None:
+            self._is_in_check = General.is_general_exposed(
+                self.board, self._current_team, self._get_the_opponent_team()
+            )
+        return self._is_in_check
+
     def get_team_win(self):
         """This method returns the winning team"""
 
@@ -286,7 +609,77 @@ class GameState:
         # Return the opponent's team if the current team has no admissible moves
         return self._get_the_opponent_team()
 
+    def encode(self) -> str:
+        """This method returns the compact text encoding of the game state:
+        90 board characters followed by the current team's notation"""
+        return self.encode_board(self.board) + self._current_team.name[0]
+
     # Static method
+    @staticmethod
+    def adjust_mate_score(score: int, ply: int) -> int:
+        """This method moves a mate score found at the given ply
+        towards zero, so that shorter mates score higher"""
+        if score >= GameState.MATE_THRESHOLD:
+            return score - ply
+        if score <= -GameState.MATE_THRESHOLD:
+            return score + ply
+        return score
+
+    @staticmethod
+    def score_to_str(score) -> str:
+        """This method converts an integer score to a readable text
+        (pawns with 2 decimals, or the distance to mate in moves)"""
+        if score is None:
+            return "None"
+        if abs(score) >= GameState.MATE_THRESHOLD:
+            moves = (GameState.MATE_SCORE - abs(score) + 1) // 2
+            return ("+" if score > 0 else "-") + "M" + str(moves)
+        return "{:+.2f}".format(score / (10 * GameState.SCORE_SCALE))
+
+    @staticmethod
+    def encode_board(board) -> str:
+        """This method returns the 90-character encoding of a board
+        (red pieces in upper case, black pieces in lower case, "." for empty)"""
+        code = list()
+        for row in board:
+            for notation in row:
+                if notation == "NN":
+                    code.append(".")
+                elif notation[0] == "R":
+                    code.append(notation[1])
+                else:
+                    code.append(notation[1].lower())
+        return "".join(code)
+
+    @staticmethod
+    def decode_board(code: str) -> list:
+        """This method returns the board of a 90-character encoding"""
+        board = list()
+        for i in range(GameState.BOARD_SIZE_X):
+            row = list()
+            for char in code[i * GameState.BOARD_SIZE_Y:(i + 1) * GameState.BOARD_SIZE_Y]:
+                if char == ".":
+                    row.append("NN")
+                elif char.isupper():
+                    row.append("R" + char)
+                else:
+                    row.append("B" + char.upper())
+            board.append(row)
+        return board
+
+    @staticmethod
+    def zobrist_hash(board, current_team: Team) -> int:
+        """This method returns the Zobrist hash of a board and side to move"""
+        hash_code = 0
+        for i in range(GameState.BOARD_SIZE_X):
+            for j in range(GameState.BOARD_SIZE_Y):
+                notation = board[i][j]
+                if notation != "NN":
+                    hash_code ^= GameState.ZOBRIST_KEYS[notation][i][j]
+        if current_team is Team.BLACK:
+            hash_code ^= GameState.ZOBRIST_BLACK_TO_MOVE
+        return hash_code
+
     @staticmethod
     def hash_board(board):
         """This method returns the hash code of a board"""
@@ -319,4 +712,20 @@ class GameState:
         initial_move_history[hash_code] = 1
         return GameState(initial_board, Team.RED, initial_move_history, value_pack)
 
+    @classmethod
+    def from_encoding(cls, code: str, value_pack: int = 0):
+        """This method creates a game state from its compact text encoding"""
+        board = cls.decode_board(code[:90])
+        number_of_red_pieces = sum(char.isupper() for char in code[:90])
+        number_of_black_pieces = sum(char.islower() for char in code[:90])
+        move_history = {cls.hash_board(board): 1}
+        return GameState(
+            board,
+            Team[code[90]],
+            move_history,
+            value_pack,
+            number_of_red_pieces,
+            number_of_black_pieces,
+        )
+
     # [END METHOD]
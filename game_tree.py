@@ -1,11 +1,17 @@
 # Made by Veil, Kleecon, TheSyx, Whatsoever
 """Module used to create GameTree class and its subclasses"""
-from math import inf
+from math import inf, sqrt
 from abc import ABC, abstractmethod
 from time import time
+from threading import Thread, Event
 from game_state import GameState
-from node import NodeMinimax, NodeMCTS, NodeExcavationMinimax
+from node import NodeMinimax, NodeMCTS, NodeExcavationMinimax, SearchTimeout
 from team import Team
+from optimization_config import (
+    SEARCH_TIME_BUDGET_MS, MAX_TREE_NODES, USE_MULTITHREADING, NUM_THREADS, MCTS_PARALLEL_MODE,
+    MCTS_EARLY_TERMINATION,
+)
+from parallel_search import MCTS_PARALLEL_SEARCH_MODES
 
 
 class GameTree(ABC):
@@ -13,7 +19,12 @@ class GameTree(ABC):
 
     # [BEGIN CONSTANTS]
 
-    MAX_NODE = inf
+    MAX_NODE = MAX_TREE_NODES
+    # Share of the node budget left after pruning, so pruning does not run every move
+    PRUNE_TARGET_RATIO = 0.75
+    MAX_SEARCH_DEPTH = 64
+    # Depth of the search predicting the opponent's reply before pondering it
+    PONDER_PREDICTION_DEPTH = 2
 
     # [END CONSTANTS]
 
@@ -27,6 +38,31 @@ class GameTree(ABC):
         )
         self._value_pack = value_pack
         self.count = 0
+        # Moves played on the tree, those landing on a searched node and the nodes kept
+        self.reuse_stats = {"moves": 0, "reused_roots": 0, "reused_nodes": 0}
+        # Nodes of the tree below (and including) the current node, and nodes freed so far
+        self.node_count = 1
+        self.pruned_nodes = 0
+        # Background search during the opponent's turn:
+        # (pondered node, best move, value, depth completed) of the expected reply
+        self._ponder_thread = None
+        self._ponder_stop = Event()
+        self.ponder_result = None
+        self.ponder_stats = {"hits": 0, "misses": 0}
+
+    # Properties initialization
+    # .current_node
+    @property
+    def current_node(self):
+        """Getter of the current node property, the root of the searches"""
+        return self._current_node
+
+    @current_node.setter
+    def current_node(self, node) -> None:
+        """Setter of the current node property; the nodes generated below it
+        are counted against the node budget of this tree"""
+        node.tree = self
+        self._current_node = node
 
     # [END INITIALIZATION]
 
@@ -36,35 +72,235 @@ class GameTree(ABC):
     def move_to_best_child(self) -> tuple:
         """This method moves the current node to its "best child" on the game tree"""
 
-        self.current_node = self.current_node.best_move()
-        self.current_node.parent = None
+        self.stop_pondering()
+        self._adopt_child(self.current_node.best_move())
 
         return self.current_node.parent_move
 
     def move_to_child_node_with_move(self, old_pos, new_pos):
-        """This method moves the current node to its "destination" on the game tree"""
+        """This method moves the current node to its "destination" on the game tree,
+        keeping the subtree already searched below it"""
+
+        self.stop_pondering()
+
+        # Look the move up among the generated children
+        node = self.current_node.get_child_with_move((old_pos, new_pos))
+        if node is not None:
+            self._adopt_child(node)
+            return
 
-        # Define a comparative game state
+        # Define a new game state
         result = GameState.generate_game_state_with_move(
             self.current_node.game_state, old_pos, new_pos
         )
-        
+
         # Handle invalid moves
         if result is None:
             return
 
+        # Suitable child not found
         new_state, move = result
+        self._record_ponder_outcome(None)
+        self.reuse_stats["moves"] += 1
+        self.current_node = self._create_node(new_state, None, move)
+        self.node_count = 1
+
+    def _adopt_child(self, node) -> None:
+        """This method makes a child the new root and records the work reused with it"""
+        self._record_ponder_outcome(node)
+        self.node_count = node.count_subtree_nodes()
+        self.reuse_stats["moves"] += 1
+        self.reuse_stats["reused_roots"] += 1
+        self.reuse_stats["reused_nodes"] += self.node_count
+
+        self.current_node = node
+        self.current_node.parent = None
+        self.enforce_node_budget()
+
+    def enforce_node_budget(self) -> int:
+        """This method frees the least valuable subtrees once the tree holds more than
+        MAX_NODE nodes (down to PRUNE_TARGET_RATIO of it) and returns the nodes freed"""
+        if self.node_count <= self.MAX_NODE:
+            return 0
+        return self.prune_tree(max(int(self.MAX_NODE * self.PRUNE_TARGET_RATIO), 1))
+
+    def prune_tree(self, target_nodes: int) -> int:
+        """This method frees the children of the nodes with the lowest retention priority
+        until at most target_nodes nodes are left (the root keeps its children)
+        and returns the number of nodes freed"""
+        root = self.current_node
+        expanded_nodes = list()
+        # A node stays if its parent keeps its children
+        parent_priorities = list()
+
+        stack = [(root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if not node.list_of_children:
+                continue
+            priority = inf if node is root else node.get_retention_priority(depth)
+            expanded_nodes.append((priority, node))
+            parent_priorities.extend([priority] * len(node.list_of_children))
+            stack.extend((child, depth + 1) for child in node.list_of_children)
+
+        node_count = len(parent_priorities) + 1
+        if node_count <= target_nodes:
+            self.node_count = node_count
+            return 0
+
+        # Priorities never grow downwards, so freeing every node below the priority
+        # of the first node over the budget drops whole subtrees
+        parent_priorities.sort(reverse=True)
+        threshold = parent_priorities[max(target_nodes - 1, 0)]
+        for priority, node in expanded_nodes:
+            if priority < threshold:
+                node.free_children()
+
+        # Then the nodes at the threshold, one by one until the budget is met
+        # (deepest first: a node is walked before its ancestors)
+        self.node_count = root.count_subtree_nodes()
+        for priority, node in reversed(expanded_nodes):
+            if self.node_count <= target_nodes:
+                break
+            if priority == threshold and node is not root and node.list_of_children:
+                self.node_count -= node.count_subtree_nodes() - 1
+                node.free_children()
+
+        freed = node_count - self.node_count
+        self.pruned_nodes += freed
+        return freed
+
+    def _record_ponder_outcome(self, node) -> None:
+        """This method counts whether the new root is the pondered node (a hit, whose
+        result think picks up) and drops the result of a miss"""
+        if self.ponder_result is None:
+            return
+        if self.ponder_result[0] is node:
+            self.ponder_stats["hits"] += 1
+        else:
+            self.ponder_stats["misses"] += 1
+            self.ponder_result = None
 
-        # Traverse states in the children list to find a suitable child
-        for node in self.current_node.list_of_children:
-            if new_state.board == node.game_state.board:
-                # Suitable child found
-                self.current_node = node
-                self.current_node.parent = None
+    def start_pondering(self) -> None:
+        """This method starts searching in the background while the opponent
+        is to move; the search stops as soon as a move is played on the tree"""
+        if self._ponder_thread is not None or not self.can_ponder() or self.is_lost():
+            return
+        self.ponder_result = None
+        self._ponder_stop.clear()
+        self._ponder_thread = Thread(target=self._ponder, daemon=True)
+        self._ponder_thread.start()
+
+    def stop_pondering(self) -> None:
+        """This method stops the background search and waits for it to return"""
+        if self._ponder_thread is None:
+            return
+        self._ponder_stop.set()
+        NodeMinimax.search_stopped = True
+        self._ponder_thread.join()
+        self._ponder_thread = None
+        NodeMinimax.search_stopped = False
+
+    def can_ponder(self) -> bool:
+        """This method tells whether the engine picks up what pondering finds
+        on its next move (not by default)"""
+        return False
+
+    def _ponder(self) -> None:
+        """This method predicts the opponent's reply with a shallow search, then
+        deepens the position after it up to the engine's target depth, which its
+        next move would not search beyond, or until pondering is stopped"""
+        root = self.current_node
+        try:
+            self._prepare_search()
+            predicted_move, _, _ = self.think(None, self.PONDER_PREDICTION_DEPTH)
+            if predicted_move is None or self._ponder_stop.is_set():
                 return
 
-        # Suitable child not found
-        self.current_node = self._create_node(new_state, None, move)
+            # The engine searches the current node, so the predicted one stands in for it
+            # (the root has no children yet if the search ran in other processes)
+            root.generate_all_children()
+            node = root.get_child_with_move(predicted_move)
+            self.current_node = node
+            self._prepare_search()
+            best_move, value, depth = self.think(None, self.target_depth)
+            if depth > 0:
+                self.ponder_result = (node, best_move, value, depth)
+        except NotImplementedError:
+            # The engine does not search by iterative deepening
+            pass
+        finally:
+            self.current_node = root
+
+    def get_reuse_stats(self) -> dict:
+        """This method returns how much of the previous searches was carried over:
+        the moves that landed on an existing node and the nodes kept with them"""
+        moves = self.reuse_stats["moves"]
+        return {
+            **self.reuse_stats,
+            "reuse_rate": (self.reuse_stats["reused_roots"] / moves * 100) if moves > 0 else 0,
+        }
+
+    def think(self, time_budget_ms=None, max_depth: int = MAX_SEARCH_DEPTH) -> tuple:
+        """This method searches the current node with iterative deepening for at most
+        time_budget_ms milliseconds (None: every depth up to max_depth) and returns
+        (best move, value, depth completed). The tree is not moved;
+        the move comes from the last completed iteration.
+        If the current node was pondered, its iterations are not searched again"""
+
+        start = time()
+        deadline = inf if time_budget_ms is None else start + time_budget_ms / 1000
+        best_move, best_value, completed_depth = None, None, 0
+        iteration_times = list()
+
+        if self.ponder_result is not None and self.ponder_result[0] is self.current_node:
+            _, best_move, best_value, completed_depth = self.ponder_result
+        self.ponder_result = None
+
+        try:
+            for depth in range(completed_depth + 1, max_depth + 1):
+                # The tree is only pruned between iterations, never under a running search
+                self.enforce_node_budget()
+                # The first iteration always completes, so there is a move to play
+                NodeMinimax.search_deadline = deadline if best_move is not None else None
+                iteration_start = time()
+                value = self._search_to_depth(depth)
+                iteration_times.append(time() - iteration_start)
+
+                best_child = self.current_node.best_move()
+                best_move, best_value, completed_depth = best_child.parent_move, value, depth
+
+                # Search the best move first in the next iteration
+                children = self.current_node.list_of_children
+                children.remove(best_child)
+                children.insert(0, best_child)
+
+                # Predict the next iteration from the effective branching factor,
+                # averaged over two iterations to smooth the odd/even effect;
+                # until then, only start an iteration in the first half of the budget
+                if len(iteration_times) >= 3 and iteration_times[-3] > 0:
+                    branching_factor = sqrt(iteration_times[-1] / iteration_times[-3])
+                    predicted = iteration_times[-1] * max(branching_factor, 1)
+                else:
+                    predicted = time() - start
+                if time() + predicted > deadline:
+                    break
+        except SearchTimeout:
+            pass
+        finally:
+            NodeMinimax.search_deadline = None
+
+        return best_move, best_value, completed_depth
+
+    def _search_to_depth(self, depth: int) -> int:
+        """This method runs a fixed-depth search from the current node and returns
+        its value (implemented by the engines that support iterative deepening)"""
+        raise NotImplementedError
+
+    def _prepare_search(self) -> None:
+        """This method readies the engine before searching the current node
+        (nothing by default)"""
+        pass
 
     def is_lost(self) -> bool:
         """This method checks if the bot had lost or not"""
@@ -85,9 +321,12 @@ class GameTreeMinimax(GameTree):
 
     # [BEGIN INITIALIZATION]
 
-    def __init__(self, team, target_depth, value_pack: int = 0):
+    def __init__(
+        self, team, target_depth, value_pack: int = 0, time_budget_ms=SEARCH_TIME_BUDGET_MS
+    ):
         super().__init__(team, value_pack)
         self.target_depth = target_depth
+        self.time_budget_ms = time_budget_ms
 
     # [END INITIALIZATION]
 
@@ -99,6 +338,18 @@ class GameTreeMinimax(GameTree):
 
         return NodeMinimax(game_state, parent, parent_move)
 
+    def can_ponder(self) -> bool:
+        """Only a search within a time budget deepens iteratively from the pondered result"""
+        return self.time_budget_ms is not None
+
+    def _search_to_depth(self, depth: int) -> int:
+        """This method runs a fixed-depth minimax search"""
+
+        # The side to move is the bot's, except when pondering
+        return self.current_node.minimax(
+            depth, self.current_node.game_state._current_team is Team.RED
+        )
+
     # Instance method
 
     def process(self, moves_queue) -> tuple:
@@ -106,12 +357,17 @@ class GameTreeMinimax(GameTree):
         # [START BOT'S TURN]
         # Start the time counter
         start = time()
-        self.current_node.minimax(self.target_depth, self.team is Team.RED)
-        old_pos, new_pos = self.move_to_best_child()
+        if self.time_budget_ms is not None:
+            (old_pos, new_pos), value, depth = self.think(self.time_budget_ms, self.target_depth)
+            self.move_to_child_node_with_move(old_pos, new_pos)
+            print("Depth:", depth)
+        else:
+            value = self.current_node.minimax(self.target_depth, self.team is Team.RED)
+            old_pos, new_pos = self.move_to_best_child()
         moves_queue.append((old_pos, new_pos))
 
         # [POST PROCESS]
-        print(self.current_node.minimax_value)
+        print(GameState.score_to_str(value))
         self.count = 0
         end = time()  # End the time counter
         print("Time: {:.2f} s".format(end - start))
@@ -126,6 +382,17 @@ class GameTreeMinimax(GameTree):
 class GameTreeMCTS(GameTree):
     """This class is responsible for performance of the MCTS game tree"""
 
+    # [BEGIN CONSTANTS]
+
+    # Root visits before a search may stop early
+    MIN_EARLY_STOP_VISITS = 50
+    # Share of the banked time a move may add to its time allowed
+    TIME_BANK_SHARE = 0.5
+    # Most time kept in the bank, in moves' time allowed
+    MAX_TIME_BANK_MOVES = 3
+
+    # [END CONSTANTS]
+
     # [BEGIN INITIALIZATION]
 
     def __init__(
@@ -134,6 +401,13 @@ class GameTreeMCTS(GameTree):
         super().__init__(team, value_pack)
         self.time_allowed = time_allowed
         self.rollout_policy = rollout_policy
+        # Time saved by moves stopped early, spent on the next ones (seconds)
+        self.time_bank = 0
+        # Worker processes growing trees of their own beside this one, or rolling it out
+        self.parallel_search = (
+            MCTS_PARALLEL_SEARCH_MODES[MCTS_PARALLEL_MODE](NUM_THREADS)
+            if USE_MULTITHREADING else None
+        )
 
     # [END INITIALIZATION]
 
@@ -148,24 +422,104 @@ class GameTreeMCTS(GameTree):
         else:
             return node
 
-    def monte_carlo_tree_search(self, root) -> None:
-        """This method performs the MCTS"""
+    def monte_carlo_tree_search(self, root, should_stop=None) -> None:
+        """This method performs the MCTS for the time allowed
+        (or until should_stop returns True)"""
+
+        if should_stop is None:
+            starting_time = time()
+            def should_stop():
+                return time() - starting_time >= self.time_allowed
 
         root.num = 0
+        while not should_stop():
+            # Leaves are only batched for the worker processes (tree-parallel MCTS):
+            # rolled out here one after another, a batch would only select on penalized
+            # statistics
+            leaves = self.select_leaves(root, 1)
+            stimulation_results = [leaf.rollout(self.rollout_policy) for leaf in leaves]
+            self.backpropagate_leaves(leaves, stimulation_results)
+
+    def create_stop_rule(self, root, time_budget):
+        """This method returns the stop rule of a search of the root for time_budget
+        seconds: out of time, a single legal move, or the child best_move ranks first
+        (by its move score) either out of reach of the others in the time left
+        or holding MCTS_EARLY_TERMINATION of the visits"""
+
         starting_time = time()
-        while time() - starting_time < self.time_allowed:
+        root.generate_all_children()
+
+        def should_stop() -> bool:
+            elapsed = time() - starting_time
+            if elapsed >= time_budget or len(root.list_of_children) <= 1:
+                return True
+
+            total_visits = sum(child.n for child in root.list_of_children)
+            if total_visits < self.MIN_EARLY_STOP_VISITS or elapsed <= 0:
+                return False
+            best_child = max(root.list_of_children, key=NodeMCTS.get_move_score)
+            if best_child.n >= MCTS_EARLY_TERMINATION * total_visits:
+                return True
+
+            # Iterations still to come at the pace of this search, any of which
+            # may go to any child
+            remaining_visits = root.num / elapsed * (time_budget - elapsed)
+            lowest_best_score = best_child.get_move_score_range(remaining_visits)[0]
+            return all(
+                child.get_move_score_range(remaining_visits)[1] < lowest_best_score
+                for child in root.list_of_children
+                if child is not best_child
+            )
+
+        return should_stop
+
+    def select_leaves(self, root, batch_size: int) -> list:
+        """This method selects and expands a batch of leaves, each counted as a lost
+        visit until it is backpropagated so that the next selections go elsewhere"""
+
+        leaves = []
+        for _ in range(batch_size):
             root.num += 1
+            self.enforce_node_budget()
             leaf = self.traverse(root)
             leaf.generate_all_children()
-            stimulation_result = leaf.rollout(self.rollout_policy)
-            leaf.backpropagate(stimulation_result)
+            leaf.add_virtual_loss()
+            leaves.append(leaf)
+        return leaves
+
+    @staticmethod
+    def backpropagate_leaves(leaves: list, results: list) -> None:
+        """This method backpropagates the rollout results of a batch of leaves"""
+
+        for leaf, result in zip(leaves, results):
+            leaf.add_virtual_loss(-1)
+            leaf.backpropagate(result)
+
+    def can_ponder(self) -> bool:
+        """The statistics of the reply played stay in its subtree"""
+        return True
+
+    def _ponder(self) -> None:
+        """This method samples every reply of the opponent until pondering is stopped;
+        the statistics of the reply played are kept with its node"""
+        self.monte_carlo_tree_search(self.current_node, self._ponder_stop.is_set)
 
     def process(self, moves_queue) -> tuple:
         """Let the bot run"""
         # [START BOT'S TURN]
         # Start the time counter
         start = time()
-        self.monte_carlo_tree_search(self.current_node)
+        time_budget = self.time_allowed + self.time_bank * self.TIME_BANK_SHARE
+        should_stop = self.create_stop_rule(self.current_node, time_budget)
+        if self.parallel_search is not None:
+            self.parallel_search.search(self, time_budget, should_stop)
+        else:
+            self.monte_carlo_tree_search(self.current_node, should_stop)
+        # The time left of the move's own allowance is banked, the time drawn is taken out
+        self.time_bank = min(
+            max(self.time_bank + self.time_allowed - (time() - start), 0),
+            self.MAX_TIME_BANK_MOVES * self.time_allowed,
+        )
         old_pos, new_pos = self.move_to_best_child()
         moves_queue.append((old_pos, new_pos))
 
@@ -191,13 +545,17 @@ class GameTreeDynamicMinimax(GameTreeMinimax):
     # [BEGIN METHODS]
     # Instance method
 
+    def can_ponder(self) -> bool:
+        """The search depth is chosen on every move, without the pondered result"""
+        return False
+
     def process(self, moves_queue) -> tuple:
         """Let the bot run"""
         # [START BOT'S TURN]
-        ADVANTAGE_CONSTANT = 25
+        ADVANTAGE_CONSTANT = 25 * GameState.SCORE_SCALE
 
         start = time()  # Start the time counter
-        print(self.current_node.game_state.value * self.team.value)
+        print(GameState.score_to_str(self.current_node.game_state.value * self.team.value))
         # If the branching factor of the current node is <= 3, then run at target depth + 2
         if len(self.current_node.game_state.all_child_gamestates) <= 3:
             self.current_node.minimax(self.target_depth + 2, self.team is Team.RED)
@@ -231,6 +589,10 @@ class GameTreeDeepeningMinimax(GameTreeMinimax):
     # [BEGIN METHODS]
     # Instance method
 
+    def can_ponder(self) -> bool:
+        """The search depth is chosen on every move, without the pondered result"""
+        return False
+
     def process(self, moves_queue) -> tuple:
         """Let the bot run"""
 
@@ -238,7 +600,7 @@ class GameTreeDeepeningMinimax(GameTreeMinimax):
         # The coefficients for each value pack
         if self._value_pack == 1:
             DEPTH_VALUE_CONSTANT = [0, 1, 2, 3, 16, 12]
-        elif self._value_pack == 2:
+        elif self._value_pack in (2, 3):
             DEPTH_VALUE_CONSTANT = [0, 1, 1, 2, 4, 7]
 
         start = time()  # Start the time counter
@@ -8,9 +8,11 @@ import gc
 from gui_utilities import Button, DropDown, InputBox
 from game_state import GameState
 from game_tree import GameTree, GameTreeMinimax, GameTreeMCTS, GameTreeDynamicMinimax, GameTreeDeepeningMinimax, GameTreeExcavationMinimax
-from advanced_algorithms import GameTreeAlphaBeta, GameTreeNegamax, GameTreeMTD, GameTreeHybrid
+from advanced_algorithms import GameTreeAlphaBeta, GameTreeNegamax, GameTreePVS, GameTreeMTD, GameTreeHybrid
 from team import Team
 from piece import Piece
+from optimization_config import RECORD_SELF_PLAY, SELF_PLAY_DATA_FILE, USE_PONDERING
+from tuning import record_self_play_game
 import os
 
 # [BEGIN INITIALIZING CONSTANT]
@@ -58,6 +60,8 @@ def str_to_type(type_str: str) -> GameTree:
         return GameTreeAlphaBeta
     elif type_str == 'Negamax':
         return GameTreeNegamax
+    elif type_str == 'PVS':
+        return GameTreePVS
     elif type_str == 'MTD(f)':
         return GameTreeMTD
     elif type_str == 'Hybrid':
@@ -140,6 +144,7 @@ def pve_screen(
                     pygame.quit()
                     sys.exit()
                 if back_button.check_for_input(mouse_pos):
+                    bot.stop_pondering()
                     pve_menu()
 
         # Draw
@@ -239,6 +244,10 @@ def pve_screen(
                     # End the bot run thread
                     bot_thread.join()
 
+                    # Keep searching while the player thinks
+                    if USE_PONDERING:
+                        bot.start_pondering()
+
                     # Post process
                     is_bot_process = False
                     player_turn = True
@@ -263,14 +272,14 @@ def pve_menu() -> None:
         20, 270, 100, 30,
         pygame.font.SysFont(None, 25),
         "Type", ["Minimax", "MCTS", "DyMinimax", "DeMinimax", "ExMinimax", 
-                 "AlphaBeta++", "Negamax", "MTD(f)", "Hybrid"])
+                 "AlphaBeta++", "Negamax", "PVS", "MTD(f)", "Hybrid"])
 
     bot_value = DropDown(
         ["#000000", "#202020"],
         ["#404040", "#606060"],
         180, 270, 100, 30,
         pygame.font.SysFont(None, 25),
-        "Pack", ["0", "1", "2"])
+        "Pack", ["0", "1", "2", "3"])
 
     team_select = DropDown(
         ["#000000", "#202020"],
@@ -490,6 +499,13 @@ def bot_run(
     turn, max_turn = 1, 200
     global is_end, force_end, winner
 
+    # Positions of the game, recorded for offline evaluation tuning
+    positions = [althea.current_node.game_state.encode()]
+
+    def record_game(result):
+        if RECORD_SELF_PLAY is True:
+            record_self_play_game(SELF_PLAY_DATA_FILE, positions, result)
+
     # Start the game loop
     while turn <= max_turn:
         # If there is a force end signal, break the loop
@@ -505,12 +521,14 @@ def bot_run(
                 break
             winner[beth.team.name] = winner.get(beth.team.name, 0) + 1
             print("Checkmate! {} wins!\n".format(beth.team.name))
+            record_game(beth.team.name[0])
             is_end = True
             return
 
         # Move solving
         old_pos, new_pos = althea.process(moves_queue)
         beth.move_to_child_node_with_move(old_pos, new_pos)
+        positions.append(beth.current_node.game_state.encode())
 
         # Post process
         value_queue.append((althea.current_node.game_state.value, beth.current_node.game_state.value))
@@ -527,12 +545,14 @@ def bot_run(
                 break
             winner[althea.team.name] = winner.get(althea.team.name, 0) + 1
             print("Checkmate! {} wins!\n".format(althea.team.name))
+            record_game(althea.team.name[0])
             is_end = True
             return
 
         # Move solving
         old_pos, new_pos = beth.process(moves_queue)
         althea.move_to_child_node_with_move(old_pos, new_pos)
+        positions.append(althea.current_node.game_state.encode())
 
         # Post process
         value_queue.append((althea.current_node.game_state.value, beth.current_node.game_state.value))
@@ -544,6 +564,8 @@ def bot_run(
 
     # If the game loop is break then the game is considered draw
     winner["DRAW"] = winner.get("DRAW", 0) + 1
+    if force_end is False:
+        record_game("D")
     is_end = True
     print("DRAW")
 
@@ -715,11 +737,11 @@ def simulation_screen(
         SCREEN.blit(text, (730, 118))
 
         text = resources.get_font(25, 0).render(
-            "Black        " + str(round(float(current_black_value), 2)), True, "Black")
+            "Black        " + GameState.score_to_str(current_black_value), True, "Black")
         SCREEN.blit(text, (670, 148))
 
         text = resources.get_font(25, 0).render(
-            "Red          " + str(round(float(current_red_value), 2)), True, "Red")
+            "Red          " + GameState.score_to_str(current_red_value), True, "Red")
         SCREEN.blit(text, (670, 178))
 
         pygame.draw.rect(SCREEN, "#AB001B", pygame.Rect(658, 240, 208, 92))
@@ -781,14 +803,14 @@ def eve_menu():
         20, 290, 100, 30,
         pygame.font.SysFont(None, 25),
         "Type", ["Minimax", "MCTS", "DyMinimax", "DeMinimax", "ExMinimax",
-                 "AlphaBeta++", "Negamax", "MTD(f)", "Hybrid"])
+                 "AlphaBeta++", "Negamax", "PVS", "MTD(f)", "Hybrid"])
 
     black_value = DropDown(
         ["#000000", "#202020"],
         ["#404040", "#606060"],
         180, 290, 100, 30,
         pygame.font.SysFont(None, 25),
-        "Pack", ["0", "1", "2"])
+        "Pack", ["0", "1", "2", "3"])
 
     red_type = DropDown(
         ["#DC1C13", "#EA4C46"],
@@ -796,14 +818,14 @@ def eve_menu():
         350, 290, 100, 30,
         pygame.font.SysFont(None, 25),
         "Type", ["Minimax", "MCTS", "DyMinimax", "DeMinimax", "ExMinimax",
-                 "AlphaBeta++", "Negamax", "MTD(f)", "Hybrid"])
+                 "AlphaBeta++", "Negamax", "PVS", "MTD(f)", "Hybrid"])
 
     red_value = DropDown(
         ["#DC1C13", "#EA4C46"],
         ["#F07470", "#F1959B"],
         510, 290, 100, 30,
         pygame.font.SysFont(None, 25),
-        "Pack", ["0", "1", "2"]
+        "Pack", ["0", "1", "2", "3"]
     )
 
     num_box = InputBox(330, 125, 40, 40, pygame.font.SysFont(
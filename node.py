@@ -3,11 +3,16 @@
 from math import inf, sqrt, log
 from abc import ABC, abstractmethod
 from random import choice, shuffle
+from time import time
 from game_state import GameState
 from team import Team
 from functools import lru_cache
 
 
+class SearchTimeout(Exception):
+    """Raised inside a search once the search deadline has passed"""
+
+
 class Node(ABC):
     """This class represents a "node" in the game tree"""
 
@@ -17,11 +22,17 @@ class Node(ABC):
         self.parent = parent
         self.parent_move = parent_move
         self.list_of_children = list()
+        # Game tree keeping count of the nodes generated below this one (shared with the parent)
+        self.tree = parent.tree if parent is not None else None
 
         # Node statistics
         self.game_state = game_state
         self._is_generated_all_children = False
 
+        # Index of the children by move (rebuilt when the children list is replaced)
+        self._children_by_move = None
+        self._indexed_children = None
+
     # [END INITIALIZATION]
 
     # [BEGIN METHOD]
@@ -42,11 +53,51 @@ class Node(ABC):
         return children
 
     def generate_all_children(self) -> None:
-        """This method fills up the list of children nodes"""
+        """This method fills up the list of children nodes
+        (counted in the node budget of the tree, enforced between searches)"""
         if self._is_generated_all_children:
             return
         self.list_of_children = self.get_all_children()
         self._is_generated_all_children = True
+        if self.tree is not None:
+            self.tree.node_count += len(self.list_of_children)
+
+    def get_child_with_move(self, move: tuple):
+        """This method returns the child reached by the move (None if it was not generated)"""
+        children = self.list_of_children
+        if (
+            self._indexed_children is not children
+            or len(self._children_by_move) != len(children)
+        ):
+            self._children_by_move = {child.parent_move: child for child in children}
+            self._indexed_children = children
+
+        return self._children_by_move.get(move)
+
+    def free_children(self) -> None:
+        """This method drops the subtree below this node to save memory
+        (the children are generated again when a search reaches the node)"""
+        self.list_of_children = list()
+        self._is_generated_all_children = False
+        self._children_by_move = None
+        self._indexed_children = None
+        self.game_state._all_child_gamestates = None
+
+    def get_retention_priority(self, depth: int):
+        """This method returns how worth keeping the subtree of this node is, given its
+        depth below the root (never more than its parent's): the deepest go first"""
+        return -depth
+
+    def count_subtree_nodes(self) -> int:
+        """This method returns the number of nodes of the subtree rooted at this node"""
+        count = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.list_of_children)
+
+        return count
 
     def sort_children_with_heuristic(self):
         """Default method for sorting children - subclasses can override"""
@@ -64,6 +115,15 @@ class Node(ABC):
 class NodeMinimax(Node):
     """This class represents a "minimax's node" in the game tree"""
 
+    # [BEGIN CONSTANTS]
+
+    # Wall-clock deadline of the running search (None: no limit)
+    search_deadline = None
+    # Set to abort the running search at once, whatever its deadline (pondering)
+    search_stopped = False
+
+    # [END CONSTANTS]
+
     # [BEGIN INITIALIZATION]
     def __init__(self, game_state: GameState, parent, parent_move: tuple) -> None:
         # Reference to a node
@@ -76,16 +136,33 @@ class NodeMinimax(Node):
     # [END INITIALIZATION]
 
     # [BEGIN METHOD]
+    # Static methods
+    @staticmethod
+    def check_deadline() -> None:
+        """This method aborts the running search once its deadline has passed
+        or once it has been stopped"""
+        if NodeMinimax.search_stopped:
+            raise SearchTimeout
+        deadline = NodeMinimax.search_deadline
+        if deadline is not None and time() > deadline:
+            raise SearchTimeout
+
     # Instance methods
     def minimax(
-        self, depth: int, max_turn: bool, alpha: float = -inf, beta: float = inf
-    ) -> float:
+        self,
+        depth: int,
+        max_turn: bool,
+        alpha: int = -GameState.INFINITE_SCORE,
+        beta: int = GameState.INFINITE_SCORE,
+        ply: int = 0,
+    ) -> int:
         """Minimax method with alpha-beta pruning optimization"""
 
+        self.check_deadline()
         self.minimax_value = None
         # If the node reaches the target depth
         if depth == 0:
-            self.minimax_value = self.game_state.value
+            self.minimax_value = GameState.adjust_mate_score(self.game_state.value, ply)
             return self.minimax_value
 
         self.generate_all_children()
@@ -93,15 +170,15 @@ class NodeMinimax(Node):
         # If the node has no child nodes
         if len(self.list_of_children) == 0:
             if self.game_state._current_team is Team.RED:
-                self.minimax_value = -inf
+                self.minimax_value = -GameState.MATE_SCORE + ply
             else:
-                self.minimax_value = inf
+                self.minimax_value = GameState.MATE_SCORE - ply
 
             return self.minimax_value
 
         # Maximizing player's turn
         if max_turn is True:
-            best_value = -inf
+            best_value = -GameState.INFINITE_SCORE
 
             # Sort the list of children once
             if self._is_children_sorted is False:
@@ -112,7 +189,7 @@ class NodeMinimax(Node):
 
             # Go to the deeper depth with early pruning
             for child in self.list_of_children:
-                value = child.minimax(depth - 1, False, alpha, beta)
+                value = child.minimax(depth - 1, False, alpha, beta, ply + 1)
                 best_value = max(best_value, value)
                 alpha = max(alpha, best_value)
                 if beta <= alpha:
@@ -122,7 +199,7 @@ class NodeMinimax(Node):
 
         # Minimizing player's turn
         else:
-            best_value = inf
+            best_value = GameState.INFINITE_SCORE
 
             # Sort the list of children once
             if self._is_children_sorted is False:
@@ -133,7 +210,7 @@ class NodeMinimax(Node):
 
             # Go to the deeper depth with early pruning
             for child in self.list_of_children:
-                value = child.minimax(depth - 1, True, alpha, beta)
+                value = child.minimax(depth - 1, True, alpha, beta, ply + 1)
                 best_value = min(best_value, value)
                 beta = min(beta, best_value)
                 if beta <= alpha:
@@ -169,6 +246,11 @@ class NodeMCTS(Node):
     EXPLORATION_CONSTANT = sqrt(6) - 1
     EXPONENTIAL_INDEX = 0.99
     MAX_NODE_COUNT = 5
+    # Result counted against a node for each of its rollouts still running, so that
+    # selections made meanwhile turn to other nodes
+    VIRTUAL_LOSS = 1
+    # Weight of the mean rating against the visits in the score of a move
+    RATING_WEIGHT = 21000
 
     # [END CONSTANTS]
 
@@ -182,6 +264,8 @@ class NodeMCTS(Node):
         self._number_of_visits = 0
         self._rating = 0
         self.worst_child = None
+        # Rollouts started below this node and not backpropagated yet
+        self.virtual_visits = 0
 
         # Other statistics
         self.is_children_sorted = False
@@ -216,14 +300,17 @@ class NodeMCTS(Node):
         current_best_uct_value = -inf
         current_result_child = []
         
-        # Pre-calculate exploration component
-        ln_n = log(self.n) if self.n > 0 else 0
+        # Pre-calculate exploration component (running rollouts count as lost visits)
+        n = self.n + self.virtual_visits
+        ln_n = log(n) if n > 0 else 0
         exploration_factor = self.e * (ln_n ** 0.5)
 
         for child in self.list_of_children:
-            if child.n != 0:
+            child_n = child.n + child.virtual_visits
+            if child_n != 0:
                 # If the current child has been visited - faster UCT calculation
-                uct = child.q / child.n + exploration_factor * (1.0 / (child.n ** self.EXPONENTIAL_INDEX))
+                q = child.q - child.virtual_visits * self.VIRTUAL_LOSS
+                uct = q / child_n + exploration_factor * (1.0 / (child_n ** self.EXPONENTIAL_INDEX))
             else:
                 # If the current child has not been visited
                 uct = inf
@@ -242,6 +329,16 @@ class NodeMCTS(Node):
         """This method creates a new MCTS node"""
         return NodeMCTS(game_state, parent, parent_move)
 
+    def free_children(self) -> None:
+        """This method drops the subtree below this node (its statistics are kept)"""
+        super().free_children()
+        self.is_children_sorted = False
+        self.rollout_index = -1
+
+    def get_retention_priority(self, depth: int):
+        """The least visited subtrees go first"""
+        return self.n
+
     def update_stat(self, result):
         """This module updates a node's statistics"""
         self._rating += result
@@ -265,11 +362,11 @@ class NodeMCTS(Node):
             elif winning_team is Team.NONE:
                 return 0
         else:
-            if self.game_state.value == inf:
+            if self.game_state.value >= GameState.MATE_THRESHOLD:
                 return 1
-            elif self.game_state.value == -inf:
+            elif self.game_state.value <= -GameState.MATE_THRESHOLD:
                 return -1
-            return self.game_state.value / 1000
+            return self.game_state.value / (1000 * GameState.SCORE_SCALE)
 
     def rollout_policy(self, value_pack):
         """This method returns the chosen simulation initialize node
@@ -352,6 +449,38 @@ class NodeMCTS(Node):
 
         current_node.update_stat(result)
 
+    def add_virtual_loss(self, visits: int = 1) -> None:
+        """This method marks a rollout started from this node on the node
+        and its ancestors (a negative count takes the marks back)"""
+
+        current_node = self
+        while current_node is not None:
+            current_node.virtual_visits += visits
+            current_node = current_node.parent
+
+    def get_move_score(self) -> float:
+        """This method returns the score best_move ranks this node by among its siblings:
+        its visits plus its weighted mean rating"""
+        if self.n == 0:
+            return 0
+        return self.n + self.q / self.n * self.RATING_WEIGHT
+
+    def get_move_score_range(self, visits: float) -> tuple:
+        """This method returns the lowest and highest move scores this node can reach
+        within the given number of further visits (every rollout result lies in [-1, 1])"""
+        n, q, weight = self.n, self.q, self.RATING_WEIGHT
+        score = self.get_move_score()
+        if visits <= 0:
+            return score, score
+
+        # Losing every visit, the score m + weight * (q + n) / m - weight over the
+        # m visits is lowest around m = sqrt(weight * (q + n)); winning every visit,
+        # m + weight * (q - n) / m + weight only grows with m
+        lowest_visits = min(max(sqrt(weight * (q + n)), n, 1), n + visits)
+        lowest = lowest_visits + weight * (q + n) / lowest_visits - weight
+        highest = n + visits + weight * (q - n) / (n + visits) + weight
+        return min(score, lowest), max(score, highest)
+
     def best_move(self):
         """This method returns the "best child" of the current node - optimized"""
 
@@ -361,7 +490,7 @@ class NodeMCTS(Node):
 
         # Single pass through children with no list clearing
         for child in self.list_of_children:
-            val = child.n + child.q / child.n * 21000 if child.n != 0 else child.n
+            val = child.get_move_score()
             
             if val > max_number_of_visits:
                 max_number_of_visits = val
@@ -400,30 +529,36 @@ class NodeExcavationMinimax(NodeMinimax):
         return res
 
     def minimax(
-        self, depth: int, max_turn: bool, alpha: float = -inf, beta: float = inf
+        self,
+        depth: int,
+        max_turn: bool,
+        alpha: int = -GameState.INFINITE_SCORE,
+        beta: int = GameState.INFINITE_SCORE,
+        ply: int = 0,
     ):
         """Excavation Minimax method"""
 
+        self.check_deadline()
         self.minimax_value = None
         # If the node reaches the target depth
         if depth == 0:
-            temp = self._simulation()
-            self.minimax_value = self.game_state.value + temp
+            temp = round(self._simulation() * GameState.SCORE_SCALE)
+            self.minimax_value = GameState.adjust_mate_score(self.game_state.value, ply) + temp
             return self.minimax_value
 
         self.generate_all_children()
         # If the current node has no child nodes
         if len(self.list_of_children) == 0:
             if self.game_state._current_team is Team.RED:
-                self.minimax_value = -inf
+                self.minimax_value = -GameState.MATE_SCORE + ply
             else:
-                self.minimax_value = inf
+                self.minimax_value = GameState.MATE_SCORE - ply
 
             return self.minimax_value
 
         # Maximizing player's turn
         if max_turn is True:
-            best_value = -inf
+            best_value = -GameState.INFINITE_SCORE
 
             # Sort the list of children
             if self._is_children_sorted is False:
@@ -434,7 +569,7 @@ class NodeExcavationMinimax(NodeMinimax):
 
             # Go to the deeper depth
             for child in self.list_of_children:
-                value = child.minimax(depth - 1, False, alpha, beta)
+                value = child.minimax(depth - 1, False, alpha, beta, ply + 1)
                 best_value = max(best_value, value)
                 alpha = max(alpha, best_value)
                 if beta <= alpha:
@@ -444,7 +579,7 @@ class NodeExcavationMinimax(NodeMinimax):
 
         # Minimizing player's turn
         else:
-            best_value = inf
+            best_value = GameState.INFINITE_SCORE
 
             # Sort the list of children
             if self._is_children_sorted is False:
@@ -455,7 +590,7 @@ class NodeExcavationMinimax(NodeMinimax):
 
             # Go to the deeper depth
             for child in self.list_of_children:
-                value = child.minimax(depth - 1, True, alpha, beta)
+                value = child.minimax(depth - 1, True, alpha, beta, ply + 1)
                 best_value = min(best_value, value)
                 beta = min(beta, best_value)
                 if beta <= alpha:
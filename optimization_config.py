@@ -6,14 +6,28 @@ This module contains optimization settings and best practices
 # Cache Settings
 CACHE_SIZE = 65536  # Maximum cache entries for board hashes and states
 PIECE_CACHE_SIZE = 10000  # Cache for piece move calculations
+THREAT_CACHE_SIZE = 65536  # Cache for per-position threat analyses
 
 # Minimax Optimization
-TRANSPOSITION_TABLE_SIZE = 100000  # Store computed positions
 KILLER_MOVE_CUTOFF_DEPTH = 4  # Use killer move heuristic at this depth
 ITERATIVE_DEEPENING_THRESHOLD = 6  # Enable iterative deepening
+USE_QUIESCENCE = True  # Resolve captures at the horizon of the alpha-beta engines
+QUIESCENCE_MAX_DEPTH = 6  # Maximum plies of captures searched past the horizon
+QUIESCENCE_CHECKS = False  # Also search quiet checking moves at the first quiescence ply
+QUIESCENCE_DELTA_MARGIN = 200  # Skip captures that cannot raise alpha even with this margin
+USE_NULL_MOVE = True  # Null-move pruning in the alpha-beta engines
+NULL_MOVE_MIN_DEPTH = 3  # Only try a null move with at least this depth left
+NULL_MOVE_REDUCTION = 2  # Depth reduction of the null-move search (one more from depth 6)
+NULL_MOVE_MIN_MAJOR_PIECES = 2  # Rooks/horses/cannons the side to move needs (zugzwang guard)
+NULL_MOVE_VERIFICATION = False  # Confirm null-move cutoffs with a reduced normal search
+USE_INTERNAL_ITERATIVE_DEEPENING = True  # Find a first move for PV nodes missing a hash move
+IID_MIN_DEPTH = 4  # Only run internal iterative deepening with at least this depth left
+IID_REDUCTION = 2  # Depth reduction of the internal iterative deepening search
+USE_NODE_FREE_SEARCH = True  # Negamax/PVS/MTD(f) keep nodes only at the root, searching below with make/unmake
+SEARCH_TIME_BUDGET_MS = None  # Per-move budget of the alpha-beta engines, depth becomes a cap (None: fixed depth)
 
 # MCTS Optimization
-MCTS_BATCH_SIZE = 4  # Number of simulations to batch together
+MCTS_BATCH_SIZE = 4  # Leaves rolled out together by a worker process (tree-parallel MCTS)
 MCTS_CACHE_MOVES = True  # Cache frequently visited moves
 MCTS_EARLY_TERMINATION = 0.95  # Stop if confidence reaches this threshold
 
@@ -39,11 +53,20 @@ PIECE_SQUARE_TABLE = {
     }
 }
 
+# Evaluation Tuning
+RECORD_SELF_PLAY = False  # Record EvE positions and results for offline tuning
+SELF_PLAY_DATA_FILE = "self_play_data.txt"  # Positions recorded by the EvE runner
+TUNED_VALUE_PACK_FILE = "tuned_value_pack.json"  # Value pack 3 tables (loaded if present)
+
 # AI Strategy
 USE_OPENING_BOOK = False  # Use predefined opening moves
 USE_ENDGAME_TABLES = False  # Use precomputed endgame solutions
 DYNAMIC_DEPTH_ADJUSTMENT = True  # Adjust search depth based on position complexity
+USE_PONDERING = True  # Keep searching the expected reply during the opponent's turn
 
 # Parallel Processing
-USE_MULTITHREADING = False  # Enable multithreading (experimental)
-NUM_THREADS = 4  # Number of threads for parallel search
+USE_MULTITHREADING = False  # Alpha-beta and MCTS engines search on worker processes (experimental)
+NUM_THREADS = 4  # Number of worker processes for parallel search
+PARALLEL_SEARCH_MODE = "lazy_smp"  # "lazy_smp", "root_split" or "ybwc" (AlphaBeta++ has no table for lazy_smp: it splits the root)
+YBWC_MIN_SPLIT_DEPTH = 3  # Young Brothers Wait only shares the brothers of nodes with at least this depth left
+MCTS_PARALLEL_MODE = "root"  # "root" (a tree per worker, root statistics summed) or "tree" (one tree, rollouts on the workers)
@@ -0,0 +1,649 @@
+"""
+Parallel Search for Chinese Chess AI
+Worker processes searching one root and sharing a transposition table in shared memory:
+Lazy SMP (each deepens the whole root), root splitting (each takes root moves)
+and Young Brothers Wait (each takes the younger brothers along the principal variation),
+and MCTS, root-parallel (each grows a tree of its own, their root statistics summed)
+or tree-parallel (each rolls out the leaves of one tree)
+"""
+
+import atexit
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import Lock, RawValue
+from multiprocessing.shared_memory import SharedMemory
+from time import time, sleep
+from game_state import GameState
+from node import NodeMinimax, NodeMCTS, SearchTimeout
+from performance_utils import TranspositionTable, TRANSPOSITION_TABLE_CONFIG
+from optimization_config import NUM_THREADS, YBWC_MIN_SPLIT_DEPTH, MCTS_BATCH_SIZE
+
+# Helper iterations skipped by each worker, so that at any time about half of them
+# search one ply deeper than the others: worker i skips depth d when
+# ((d + SKIP_PHASE[i]) // SKIP_SIZE[i]) is odd (worker 0 searches every depth)
+SKIP_SIZE = (1, 1, 1, 2, 2, 2, 2, 3, 3, 3, 3, 3, 3, 4, 4, 4, 4, 4, 4, 4)
+SKIP_PHASE = (0, 0, 1, 0, 1, 2, 3, 0, 1, 2, 3, 4, 5, 0, 1, 2, 3, 4, 5, 6)
+
+# How often the main process and the workers look at the stop flag (seconds)
+STOP_POLL_INTERVAL = 0.005
+
+# Batches of rollouts kept running for each worker by tree-parallel MCTS, so that
+# a worker has the next one queued while the main process backpropagates its last one
+BATCHES_PER_WORKER = 2
+
+
+# ========== POSITION TRANSFER ==========
+
+def encode_position(game_state: GameState) -> tuple:
+    """Return what a worker needs to rebuild the game state: its compact encoding,
+    value pack and move history (for the repetition rule), not the pickled tree"""
+    return game_state.encode(), game_state._value_pack, game_state.move_history
+
+
+def decode_position(position: tuple) -> GameState:
+    """Return the game state of an encode_position result"""
+    code, value_pack, move_history = position
+    game_state = GameState.from_encoding(code, value_pack)
+    game_state.move_history = dict(move_history)
+    return game_state
+
+
+# ========== WORKER PROCESS ==========
+
+# State of a worker process, set by its initializer
+_worker = dict()
+
+
+def _init_worker(
+    table_name: str, size_mb, replacement_strategy: str, stop_generation, bound, bound_lock
+) -> None:
+    """Attach the shared transposition table (if any) in place of the process' own,
+    and watch the stop flag of the main process"""
+    import advanced_algorithms
+
+    memory, table = None, None
+    if table_name is not None:
+        memory = SharedMemory(name=table_name)
+        table = TranspositionTable(size_mb, replacement_strategy, buffer=memory.buf)
+        advanced_algorithms.transposition_table = table
+
+    # Forked workers would otherwise share the random state of the main process
+    random.seed()
+    _worker.update(
+        memory=memory, table=table, stop_generation=stop_generation, generation=0,
+        stoppable=True, search_alpha=None,
+        lock=threading.Lock(), bound=bound, bound_lock=bound_lock, heuristics=dict(),
+    )
+    threading.Thread(target=_watch_stop_flag, daemon=True).start()
+
+
+def _watch_stop_flag() -> None:
+    """Abort the running search once the main process stops its generation,
+    or once the shared bound rises above the alpha of a split search"""
+    while True:
+        _update_stop_flag()
+        sleep(STOP_POLL_INTERVAL)
+
+
+def _update_stop_flag() -> None:
+    with _worker["lock"]:
+        search_alpha = _worker["search_alpha"]
+        NodeMinimax.search_stopped = _worker["stoppable"] and (
+            _is_generation_stopped()
+            or (search_alpha is not None and _worker["bound"].value > search_alpha)
+        )
+
+
+def _is_generation_stopped() -> bool:
+    return _worker["stop_generation"].value >= _worker["generation"]
+
+
+def _set_stoppable(stoppable: bool) -> None:
+    """Let the stop flag of the main process abort the running search or not"""
+    with _worker["lock"]:
+        _worker["stoppable"] = stoppable
+    _update_stop_flag()
+
+
+def _set_search_alpha(alpha) -> None:
+    """Abort the running search once the shared bound rises above alpha (None: never)"""
+    with _worker["lock"]:
+        _worker["search_alpha"] = alpha
+    _update_stop_flag()
+
+
+def _begin_task(generation: int, age: int) -> None:
+    """Start a task of the given generation, with the table entries of the given age"""
+    with _worker["lock"]:
+        _worker["generation"] = generation
+    _set_stoppable(True)
+    if _worker["table"] is not None:
+        _worker["table"].age = age
+
+
+def _create_worker_tree(engine_class, game_state: GameState, age: int):
+    """Return an engine of the given class searching the game state. The process
+    keeps its move ordering tables from task to task, aged on every new search"""
+    tree = engine_class(game_state._current_team, 1, game_state._value_pack, None)
+    cached = _worker["heuristics"].get(engine_class)
+    if cached is not None:
+        tree.heuristics, heuristics_age = cached
+        if heuristics_age != age:
+            tree.heuristics.age()
+    _worker["heuristics"][engine_class] = (tree.heuristics, age)
+
+    tree.current_node = tree._create_node(game_state, None, None)
+    tree.current_node.heuristics = tree.heuristics
+    return tree
+
+
+def _is_depth_skipped(worker_id: int, depth: int) -> bool:
+    if worker_id == 0:
+        return False
+    index = (worker_id - 1) % len(SKIP_SIZE)
+    return ((depth + SKIP_PHASE[index]) // SKIP_SIZE[index]) % 2 == 1
+
+
+def _lazy_smp_worker(
+    generation: int, age: int, engine_class, worker_id: int,
+    position: tuple, deadline, max_depth: int,
+) -> tuple:
+    """Deepen the position iteratively with a fresh engine of the given class
+    and return (best move, value, depth completed) of its last iteration"""
+    _begin_task(generation, age)
+    tree = _create_worker_tree(engine_class, decode_position(position), age)
+
+    best_move, best_value, completed_depth = None, None, 0
+    try:
+        for depth in range(1, max_depth + 1):
+            if _is_depth_skipped(worker_id, depth) and depth < max_depth:
+                continue
+            # The main worker always completes its first iteration, so there is a move to play:
+            # neither the deadline nor the stop flag aborts it
+            first_iteration = worker_id == 0 and best_move is None
+            NodeMinimax.search_deadline = None if first_iteration else deadline
+            _set_stoppable(not first_iteration)
+            value = tree._search_to_depth(depth)
+            best_move, best_value, completed_depth = (
+                tree.current_node.best_move().parent_move, value, depth
+            )
+    except SearchTimeout:
+        pass
+    finally:
+        NodeMinimax.search_deadline = None
+
+    return best_move, best_value, completed_depth
+
+
+def _split_worker(
+    generation: int, age: int, engine_class, position: tuple,
+    move: tuple, depth: int, beta: int, ply: int, deadline,
+) -> tuple:
+    """Search one move of the position (found at the ply) to the position's depth
+    against the shared bound and beta, and return (move, value, exact),
+    the value being seen from the side to move of the position (None on timeout)"""
+    _begin_task(generation, age)
+    tree = _create_worker_tree(engine_class, decode_position(position), age)
+    child_state, move = tree.current_node.game_state.generate_game_state_with_move(*move)
+    node = tree._create_node(child_state, tree.current_node, move)
+    bound = _worker["bound"]
+
+    NodeMinimax.search_deadline = deadline
+    try:
+        while True:
+            # The search is aborted and started again with the narrower window
+            # whenever another move raises the shared bound
+            alpha = bound.value
+            if alpha >= beta:
+                # Another move has cut the node off
+                return move, None, False
+            _set_search_alpha(alpha)
+            try:
+                # Moves after the first only need to prove they do not beat the best one
+                # (at full depth: a split move is never reduced)
+                if alpha > -GameState.INFINITE_SCORE:
+                    value = -tree.search_node(node, depth - 1, -alpha - 1, -alpha, ply + 1)
+                    if value <= alpha:
+                        return move, value, False
+
+                value = -tree.search_node(node, depth - 1, -beta, -alpha, ply + 1)
+                break
+            except SearchTimeout:
+                if (
+                    _is_generation_stopped()
+                    or (deadline is not None and time() > deadline)
+                    or bound.value <= alpha
+                ):
+                    return move, None, False
+
+        with _worker["bound_lock"]:
+            if value > bound.value:
+                bound.value = value
+        return move, value, alpha < value < beta
+    finally:
+        _set_search_alpha(None)
+        NodeMinimax.search_deadline = None
+
+
+def _mcts_worker(
+    generation: int, age: int, engine_class, seed: int,
+    position: tuple, time_allowed, rollout_policy: str,
+) -> tuple:
+    """Grow a tree of its own from the position for time_allowed seconds, its random
+    rollouts drawn from the seed, and return the visits of its root with
+    {move: (visits, rating)} of the root's children"""
+    _begin_task(generation, age)
+    random.seed(seed)
+    game_state = decode_position(position)
+    tree = engine_class(
+        game_state._current_team, time_allowed, game_state._value_pack, rollout_policy
+    )
+    tree.current_node = root = tree._create_node(game_state, None, None)
+
+    starting_time = time()
+    tree.monte_carlo_tree_search(
+        root,
+        lambda: NodeMinimax.search_stopped or time() - starting_time >= time_allowed,
+    )
+    return root.n, {
+        child.parent_move: (child.n, child._rating) for child in root.list_of_children
+    }
+
+
+def _rollout_worker(generation: int, age: int, positions: list, rollout_policy: str) -> list:
+    """Return the results of a rollout of each position"""
+    _begin_task(generation, age)
+    return [
+        NodeMCTS(decode_position(position), None, None).rollout(rollout_policy)
+        for position in positions
+    ]
+
+
+def rank_root_scores(scores: dict) -> list:
+    """Return the (move, value) pairs of {move: (value, exact)} best first.
+    A move that only failed low keeps an upper bound, lowered below the best
+    value so that it never ties with the best move"""
+    best_value = max(value for value, _ in scores.values())
+    ranked = [
+        (move, value if exact else min(value, best_value - 1))
+        for move, (value, exact) in scores.items()
+    ]
+    # Among equal values the exact one (the best move) comes first
+    ranked.sort(key=lambda item: (item[1], scores[item[0]][1]), reverse=True)
+    return ranked
+
+
+# ========== PARALLEL SEARCHES ==========
+
+class ParallelSearch:
+    """Worker processes kept between searches, sharing a transposition table
+    in shared memory (unless SHARED_TABLE is False), a stop flag and a bound
+    of the searched root"""
+
+    SHARED_TABLE = True
+
+    def __init__(
+        self,
+        num_workers: int = NUM_THREADS,
+        size_mb=TRANSPOSITION_TABLE_CONFIG["size_mb"],
+        replacement_strategy=TRANSPOSITION_TABLE_CONFIG["replacement_strategy"],
+    ) -> None:
+        self.num_workers = num_workers
+        self.size_mb = size_mb
+        self.replacement_strategy = replacement_strategy
+        # Batches of tasks submitted (the stop flag holds the last one stopped)
+        self.generation = 0
+        # Age of the table entries, advanced on every search
+        self.age = 0
+        self._memory = None
+        self._table = None
+        self._executor = None
+        self._stop_generation = None
+        self._bound = None
+
+    def _start(self) -> None:
+        """Create the shared table and the worker processes"""
+        if self.SHARED_TABLE:
+            self._memory = SharedMemory(
+                create=True, size=TranspositionTable.get_table_bytes(self.size_mb)
+            )
+            self._table = TranspositionTable(
+                self.size_mb, self.replacement_strategy, buffer=self._memory.buf
+            )
+        self._stop_generation = RawValue('q', 0)
+        self._bound = RawValue('q', -GameState.INFINITE_SCORE)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            initializer=_init_worker,
+            initargs=(
+                self._memory.name if self._memory is not None else None,
+                self.size_mb, self.replacement_strategy,
+                self._stop_generation, self._bound, Lock(),
+            ),
+        )
+        atexit.register(self.shutdown)
+
+    def _new_search(self) -> None:
+        if self._executor is None:
+            self._start()
+        self.age = (self.age + 1) & TranspositionTable._AGE_MASK
+        if self._table is not None:
+            self._table.age = self.age
+
+    def _submit_all(self, function, arguments_list: list) -> list:
+        """Submit a batch of tasks, each called with the batch's generation and age first"""
+        self.generation += 1
+        return [
+            self._executor.submit(function, self.generation, self.age, *arguments)
+            for arguments in arguments_list
+        ]
+
+    def _wait(self, futures: list, is_finished) -> bool:
+        """Wait until is_finished returns True or every task has returned, then stop
+        the others and wait for them to return. Return False if
+        NodeMinimax.search_stopped stopped the search first"""
+        completed = False
+        pending = futures
+        while not NodeMinimax.search_stopped:
+            _, pending = wait(pending, timeout=STOP_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            if not pending or is_finished():
+                completed = True
+                break
+        self._stop_generation.value = self.generation
+        wait(futures)
+        return completed
+
+    def _search_moves(
+        self, engine_class, game_state: GameState, moves: list,
+        depth: int, alpha: int, beta: int, ply: int, deadline,
+    ) -> list:
+        """Search the moves of the game state (found at the ply) on the workers,
+        the shared bound starting at alpha, and return their (move, value, exact).
+        A move reaching beta stops the others (a cutoff) and is returned alone.
+        Raise SearchTimeout if a move ran out of time or the search was stopped"""
+        self._bound.value = alpha
+        position = encode_position(game_state)
+        futures = self._submit_all(
+            _split_worker,
+            [(engine_class, position, move, depth, beta, ply, deadline) for move in moves],
+        )
+
+        pending = futures
+        cutoff = None
+        while pending and cutoff is None and not NodeMinimax.search_stopped:
+            done, pending = wait(pending, timeout=STOP_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                value = future.result()[1]
+                if value is not None and value >= beta:
+                    cutoff = future.result()
+        self._stop_generation.value = self.generation
+        wait(futures)
+
+        if cutoff is not None:
+            return [cutoff]
+        results = [future.result() for future in futures]
+        if pending or any(value is None for _, value, _ in results):
+            raise SearchTimeout
+        return results
+
+    def search(self, tree, time_budget_ms, max_depth: int) -> tuple:
+        """Search the current node of the tree for at most time_budget_ms
+        milliseconds (None: up to max_depth) and return (best move, value, depth
+        completed) like GameTree.think. A running search also stops when
+        NodeMinimax.search_stopped is set"""
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        """Stop the worker processes and free the shared table"""
+        if self._executor is None:
+            return
+        self._executor.shutdown()
+        self._executor = None
+        if self._memory is None:
+            return
+        # The table's views must be gone before the memory is closed
+        self._table = None
+        self._memory.close()
+        self._memory.unlink()
+        self._memory = None
+
+
+class LazySMP(ParallelSearch):
+    """Lazy SMP search: every worker process deepens the same root, the helpers
+    staggered over two depths, and they only cooperate through the shared
+    transposition table"""
+
+    def search(self, tree, time_budget_ms, max_depth: int) -> tuple:
+        self._new_search()
+        deadline = None if time_budget_ms is None else time() + time_budget_ms / 1000
+        position = encode_position(tree.current_node.game_state)
+        futures = self._submit_all(
+            _lazy_smp_worker,
+            [
+                (type(tree), worker_id, position, deadline, max_depth)
+                for worker_id in range(self.num_workers)
+            ],
+        )
+
+        # The search is over once the main worker returns (it has a move by then)
+        # or a helper completes max_depth. A helper meeting the deadline returns
+        # without ending it, maybe without a move
+        def is_finished() -> bool:
+            return futures[0].done() or any(
+                future.done() and future.result()[2] == max_depth for future in futures
+            )
+
+        self._wait(futures, is_finished)
+
+        # The deepest iteration wins, the main worker first among equals
+        best_move, best_value, completed_depth = None, None, 0
+        for future in futures:
+            move, value, depth = future.result()
+            if depth > completed_depth:
+                best_move, best_value, completed_depth = move, value, depth
+
+        if best_move is None:
+            # No worker returned a move: a depth 1 search here provides one
+            try:
+                best_value = tree._search_to_depth(1)
+                best_move, completed_depth = tree.current_node.best_move().parent_move, 1
+            except SearchTimeout:
+                pass
+        return best_move, best_value, completed_depth
+
+
+class RootSplit(ParallelSearch):
+    """Root splitting: every iteration searches each root move as a task of its own,
+    best moves first, the workers taking the best value proved so far at the root
+    as their bound when they start a move. Only the position encoding is sent,
+    the values come back into the root's children"""
+
+    def search(self, tree, time_budget_ms, max_depth: int) -> tuple:
+        self._new_search()
+        start = time()
+        deadline = None if time_budget_ms is None else start + time_budget_ms / 1000
+        root = tree.current_node
+        root.generate_all_children()
+        root.sort_children_with_heuristic(0)
+
+        best_move, best_value, completed_depth = None, None, 0
+        try:
+            for depth in range(1, max_depth + 1):
+                if not root.list_of_children:
+                    break
+                # The first iteration always completes, so there is a move to play
+                iteration_deadline = deadline if depth > 1 else None
+                NodeMinimax.search_deadline = iteration_deadline
+                results = self._search_root(tree, depth, iteration_deadline)
+
+                best_value = tree.set_root_scores(
+                    {move: (value, exact) for move, value, exact in results}
+                )
+                best_move, completed_depth = root.list_of_children[0].parent_move, depth
+                if deadline is not None and time() - start > (deadline - start) / 2:
+                    break
+        except SearchTimeout:
+            pass
+        finally:
+            NodeMinimax.search_deadline = None
+
+        return best_move, best_value, completed_depth
+
+    def _search_root(self, tree, depth: int, deadline) -> list:
+        """Search every root move to the depth and return their (move, value, exact)"""
+        root = tree.current_node
+        return self._search_moves(
+            type(tree), root.game_state, [child.parent_move for child in root.list_of_children],
+            depth, -GameState.INFINITE_SCORE, GameState.INFINITE_SCORE, 0, deadline,
+        )
+
+
+class YoungBrothersWait(RootSplit):
+    """Young Brothers Wait Concept: at every node with at least YBWC_MIN_SPLIT_DEPTH
+    plies left, the eldest child (first in the AlphaBeta++ order) is searched first
+    in this process, splitting its own younger brothers the same way. Only then are
+    the younger brothers shared between the workers, the node's alpha being their
+    shared bound, and a brother reaching beta stops the others.
+    This process searches with the shared transposition table too"""
+
+    def search(self, tree, time_budget_ms, max_depth: int) -> tuple:
+        import advanced_algorithms
+
+        if self._executor is None:
+            self._start()
+        own_table = advanced_algorithms.transposition_table
+        if own_table is not None:
+            advanced_algorithms.transposition_table = self._table
+        try:
+            return super().search(tree, time_budget_ms, max_depth)
+        finally:
+            advanced_algorithms.transposition_table = own_table
+
+    def _search_root(self, tree, depth: int, deadline) -> list:
+        root = tree.current_node
+        eldest, *younger = root.list_of_children
+        value = -self._search_split_node(
+            tree, eldest, depth - 1, -GameState.INFINITE_SCORE, GameState.INFINITE_SCORE,
+            1, deadline,
+        )
+        results = [(eldest.parent_move, value, True)]
+        if younger:
+            results += self._search_moves(
+                type(tree), root.game_state, [child.parent_move for child in younger],
+                depth, value, GameState.INFINITE_SCORE, 0, deadline,
+            )
+        return results
+
+    def _search_split_node(
+        self, tree, node, depth: int, alpha: int, beta: int, ply: int, deadline
+    ) -> int:
+        """Search a node on the eldest brothers' path and return its value
+        seen from its side to move"""
+        if depth < YBWC_MIN_SPLIT_DEPTH:
+            return tree.search_node(node, depth, alpha, beta, ply)
+        node.generate_all_children()
+        if not node.list_of_children:
+            return tree.search_node(node, depth, alpha, beta, ply)
+
+        node.sort_children_with_heuristic(ply)
+        eldest, *younger = node.list_of_children
+        best_value = -self._search_split_node(
+            tree, eldest, depth - 1, -beta, -alpha, ply + 1, deadline
+        )
+        if best_value >= beta or not younger:
+            return best_value
+
+        # The younger brothers wait for the eldest, then run in parallel
+        results = self._search_moves(
+            type(tree), node.game_state, [child.parent_move for child in younger],
+            depth, max(alpha, best_value), beta, ply, deadline,
+        )
+        return max(best_value, max(value for _, value, _ in results))
+
+
+class RootParallelMCTS(ParallelSearch):
+    """Root-parallel MCTS: while this process grows the tree for its time allowed,
+    every worker process grows an independent tree from the same root with a seed
+    of its own. Only the statistics of the root's children come back, and they are
+    added to the tree's before its best move is chosen"""
+
+    SHARED_TABLE = False
+
+    def search(self, tree, time_budget, should_stop) -> None:
+        """Grow the current node of the tree for at most time_budget seconds,
+        until should_stop returns True"""
+        self._new_search()
+        root = tree.current_node
+        position = encode_position(root.game_state)
+        futures = self._submit_all(
+            _mcts_worker,
+            [
+                (type(tree), random.getrandbits(64), position,
+                 time_budget, tree.rollout_policy)
+                for _ in range(self.num_workers)
+            ],
+        )
+
+        tree.monte_carlo_tree_search(root, should_stop)
+        # The workers stop with this process
+        self._stop_generation.value = self.generation
+        wait(futures)
+
+        root.generate_all_children()
+        children = {child.parent_move: child for child in root.list_of_children}
+        for future in futures:
+            root_visits, statistics = future.result()
+            root._number_of_visits += root_visits
+            for move, (visits, rating) in statistics.items():
+                children[move]._number_of_visits += visits
+                children[move]._rating += rating
+
+
+class TreeParallelMCTS(ParallelSearch):
+    """Tree-parallel MCTS: this process selects, expands and backpropagates on the
+    tree while the worker processes roll the selected leaves out, MCTS_BATCH_SIZE
+    leaves a task. A leaf whose rollout is running counts as lost (virtual loss),
+    so the next selections go elsewhere and one tree grows deeper than root
+    parallelism's many small ones"""
+
+    SHARED_TABLE = False
+
+    def search(self, tree, time_budget, should_stop) -> None:
+        """Grow the current node of the tree for at most time_budget seconds,
+        until should_stop returns True"""
+        self._new_search()
+        self.generation += 1
+        root = tree.current_node
+        root.num = 0
+        running = dict()
+        try:
+            while not should_stop():
+                while len(running) < self.num_workers * BATCHES_PER_WORKER:
+                    leaves = tree.select_leaves(root, MCTS_BATCH_SIZE)
+                    running[self._executor.submit(
+                        _rollout_worker, self.generation, self.age,
+                        [encode_position(leaf.game_state) for leaf in leaves],
+                        tree.rollout_policy,
+                    )] = leaves
+                done, _ = wait(running, timeout=STOP_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tree.backpropagate_leaves(running.pop(future), future.result())
+        finally:
+            # The last rollouts are short, they are waited for rather than wasted
+            for future, leaves in running.items():
+                tree.backpropagate_leaves(leaves, future.result())
+
+
+# Parallel search of each PARALLEL_SEARCH_MODE
+PARALLEL_SEARCH_MODES = {
+    "lazy_smp": LazySMP,
+    "root_split": RootSplit,
+    "ybwc": YoungBrothersWait,
+}
+
+# Parallel search of each MCTS_PARALLEL_MODE
+MCTS_PARALLEL_SEARCH_MODES = {
+    "root": RootParallelMCTS,
+    "tree": TreeParallelMCTS,
+}
@@ -7,6 +7,8 @@ import time
 from functools import wraps
 from collections import OrderedDict
 import gc
+from array import array
+from algorithm_config import HEURISTIC_CONFIG
 from optimization_config import (
     CACHE_SIZE, 
     GARBAGE_COLLECTION_INTERVAL,
@@ -14,6 +16,8 @@ from optimization_config import (
     PROFILE_OUTPUT_FILE
 )
 
+TRANSPOSITION_TABLE_CONFIG = HEURISTIC_CONFIG["transposition_table"]
+
 
 class LRUCache:
     """Custom LRU Cache implementation for board states"""
@@ -58,39 +62,247 @@ class LRUCache:
 
 
 class TranspositionTable:
-    """Transposition table for storing computed game states"""
-    
-    def __init__(self, maxsize=100000):
-        self.table = {}
-        self.maxsize = maxsize
+    """Transposition table for storing computed game states.
+    Entries live in two preallocated arrays of 64-bit words (the position key
+    and the packed entry), grouped in power-of-two buckets of BUCKET_SIZE slots.
+    Packed entry: age (7 bits), depth (7), best move (14), lower bound (18), upper bound (18),
+    so a position keeps both bounds (as MTD(f) needs) and is exact when they meet.
+    The key word holds the position key XOR the packed entry, so an entry torn by
+    concurrent writers (a table shared between processes) fails verification and reads as empty"""
+
+    # Kinds of stored values
+    EXACT = 1
+    LOWER = 2
+    UPPER = 3
+
+    BUCKET_SIZE = 4
+    ENTRY_BYTES = 16  # Key word + data word
+    REPLACEMENT_STRATEGIES = ("always", "depth", "new")
+
+    _AGE_MASK = 0x7F
+    _MAX_DEPTH = 0x7F
+    _MOVE_MASK = 0x3FFF
+    _SCORE_BITS = 18
+    _SCORE_MASK = (1 << _SCORE_BITS) - 1
+    _SCORE_OFFSET = 1 << (_SCORE_BITS - 1)
+    # Missing bounds (never valid scores, so an empty slot reads as 0)
+    _NO_LOWER = 0
+    _NO_UPPER = _SCORE_MASK
+
+    def __init__(
+        self,
+        size_mb=TRANSPOSITION_TABLE_CONFIG["size_mb"],
+        replacement_strategy=TRANSPOSITION_TABLE_CONFIG["replacement_strategy"],
+        buffer=None,
+    ):
+        """buffer: writable memory of at least get_table_bytes(size_mb) bytes holding
+        the entries (e.g. shared memory), instead of arrays owned by the table"""
+        if replacement_strategy not in self.REPLACEMENT_STRATEGIES:
+            raise ValueError(f"Unknown replacement strategy: {replacement_strategy}")
+        self.replacement_strategy = replacement_strategy
+
+        self.size = self.get_slot_count(size_mb)
+        self.bucket_mask = self.size // self.BUCKET_SIZE - 1
+
+        if buffer is None:
+            self.keys = array('Q', bytes(8 * self.size))
+            self.data = array('Q', bytes(8 * self.size))
+        else:
+            words = memoryview(buffer)[:self.size * self.ENTRY_BYTES].cast('Q')
+            self.keys = words[:self.size]
+            self.data = words[self.size:]
+        self.age = 0
         self.hits = 0
         self.misses = 0
-    
-    def store(self, board_hash, depth, value, flag):
-        """Store (hash, depth, value, flag) in transposition table
-        flag: 'EXACT', 'LOWER', 'UPPER'
+
+    @classmethod
+    def get_slot_count(cls, size_mb):
+        """Return the number of slots of a table of size_mb megabytes:
+        the largest power-of-two bucket count that fits the budget"""
+        max_entries = max(int(size_mb * 1024 * 1024) // cls.ENTRY_BYTES, cls.BUCKET_SIZE)
+        bucket_count = 1
+        while bucket_count * 2 * cls.BUCKET_SIZE <= max_entries:
+            bucket_count *= 2
+        return bucket_count * cls.BUCKET_SIZE
+
+    @classmethod
+    def get_table_bytes(cls, size_mb):
+        """Return the memory taken by the entries of a table of size_mb megabytes"""
+        return cls.get_slot_count(size_mb) * cls.ENTRY_BYTES
+
+    @staticmethod
+    def encode_move(move):
+        """Pack ((old_x, old_y), (new_x, new_y)) into 14 bits, 0 meaning no move"""
+        if move is None:
+            return 0
+        (old_x, old_y), (new_x, new_y) = move
+        return (old_x * 9 + old_y) * 90 + new_x * 9 + new_y + 1
+
+    @staticmethod
+    def decode_move(code):
+        if code == 0:
+            return None
+        old_square, new_square = divmod(code - 1, 90)
+        return divmod(old_square, 9), divmod(new_square, 9)
+
+    def _pack(self, depth, move_code, lower_field, upper_field):
+        return (
+            self.age
+            | min(max(depth, 0), self._MAX_DEPTH) << 7
+            | move_code << 14
+            | lower_field << 28
+            | upper_field << 46
+        )
+
+    def _find(self, board_hash):
+        """Return (slot, packed entry) of the position, or (-1, 0)"""
+        start = (board_hash & self.bucket_mask) * self.BUCKET_SIZE
+        keys = self.keys
+        data = self.data
+        for slot in range(start, start + self.BUCKET_SIZE):
+            entry = data[slot]
+            if entry and keys[slot] ^ entry == board_hash:
+                return slot, entry
+        return -1, 0
+
+    def _choose_victim(self, board_hash, depth):
+        """Return the slot to overwrite in the position's bucket, or -1 to keep the bucket"""
+        start = (board_hash & self.bucket_mask) * self.BUCKET_SIZE
+        data = self.data
+        victim = -1
+        victim_rank = None
+        for slot in range(start, start + self.BUCKET_SIZE):
+            entry = data[slot]
+            if not entry:
+                return slot
+            entry_depth = (entry >> 7) & self._MAX_DEPTH
+            stale = (entry & self._AGE_MASK) != self.age
+            if self.replacement_strategy == "always":
+                rank = (entry_depth, not stale)
+            else:
+                # Entries left over from earlier searches go first
+                rank = (not stale, entry_depth)
+            if victim_rank is None or rank < victim_rank:
+                victim = slot
+                victim_rank = rank
+
+        # Depth-preferred: never drop a deeper entry of the current search
+        if self.replacement_strategy == "depth" and victim_rank[0] and victim_rank[1] > depth:
+            return -1
+        return victim
+
+    def store(self, board_hash, depth, value, flag, move=None):
+        """Store (hash, depth, value, flag, best move) in transposition table
+        flag: EXACT, LOWER or UPPER (the other bound of the same depth is kept)
         """
-        if len(self.table) >= self.maxsize:
-            # Simple eviction: remove oldest entry
-            self.table.pop(next(iter(self.table)))
-        
-        self.table[board_hash] = {'depth': depth, 'value': value, 'flag': flag}
-    
+        slot, entry = self._find(board_hash)
+        move_code = self.encode_move(move)
+        value_field = value + self._SCORE_OFFSET
+        lower_field = value_field if flag != self.UPPER else self._NO_LOWER
+        upper_field = value_field if flag != self.LOWER else self._NO_UPPER
+
+        if slot >= 0:
+            entry_depth = (entry >> 7) & self._MAX_DEPTH
+            # Keep the known best move when this search did not find one
+            if move_code == 0:
+                move_code = (entry >> 14) & self._MOVE_MASK
+            if (
+                self.replacement_strategy == "depth"
+                and (entry & self._AGE_MASK) == self.age
+                and entry_depth > depth
+                and flag != self.EXACT
+            ):
+                entry = (entry & ~(self._MOVE_MASK << 14)) | move_code << 14
+                self.keys[slot] = board_hash ^ entry
+                self.data[slot] = entry
+                return
+            # A bound of the same depth completes the other one
+            if entry_depth == min(depth, self._MAX_DEPTH) and flag != self.EXACT:
+                if flag == self.LOWER:
+                    upper_field = (entry >> 46) & self._SCORE_MASK
+                else:
+                    lower_field = (entry >> 28) & self._SCORE_MASK
+        else:
+            slot = self._choose_victim(board_hash, depth)
+            if slot < 0:
+                return
+
+        entry = self._pack(depth, move_code, lower_field, upper_field)
+        self.keys[slot] = board_hash ^ entry
+        self.data[slot] = entry
+
+    def probe(self, board_hash):
+        """Return (depth, lower bound, upper bound, best move) of the position,
+        a missing bound being None, or None if the position is not stored"""
+        slot, entry = self._find(board_hash)
+        if slot < 0:
+            self.misses += 1
+            return None
+        self.hits += 1
+        lower_field = (entry >> 28) & self._SCORE_MASK
+        upper_field = (entry >> 46) & self._SCORE_MASK
+        return (
+            (entry >> 7) & self._MAX_DEPTH,
+            lower_field - self._SCORE_OFFSET if lower_field != self._NO_LOWER else None,
+            upper_field - self._SCORE_OFFSET if upper_field != self._NO_UPPER else None,
+            self.decode_move((entry >> 14) & self._MOVE_MASK),
+        )
+
     def lookup(self, board_hash, depth):
         """Lookup value in transposition table"""
-        if board_hash in self.table:
-            entry = self.table[board_hash]
-            if entry['depth'] >= depth:
-                self.hits += 1
-                return entry['value'], entry['flag']
-        self.misses += 1
-        return None, None
-    
+        entry = self.probe(board_hash)
+        if entry is None or entry[0] < depth:
+            return None, None
+        _, lower, upper, _ = entry
+        if lower is not None and lower == upper:
+            return lower, self.EXACT
+        if lower is not None:
+            return lower, self.LOWER
+        return upper, self.UPPER
+
+    def new_search(self):
+        """Start a new search generation, older entries become preferred victims"""
+        self.age = (self.age + 1) & self._AGE_MASK
+
     def clear(self):
-        self.table.clear()
+        # In place, so a table in shared memory stays shared
+        self.keys[:] = array('Q', bytes(8 * self.size))
+        self.data[:] = array('Q', bytes(8 * self.size))
+        self.age = 0
         self.hits = 0
         self.misses = 0
 
+    def get_stats(self):
+        total = self.hits + self.misses
+        hit_rate = (self.hits / total * 100) if total > 0 else 0
+        # Occupancy sampled over the first thousand buckets
+        sample = self.data[:min(self.size, 1000 * self.BUCKET_SIZE)]
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': hit_rate,
+            'size': self.size,
+            'fill_rate': sum(1 for entry in sample if entry) / len(sample) * 100,
+        }
+
+    @staticmethod
+    def score_to_tt(score, ply, mate_threshold):
+        """Convert a mate score from "distance to root" to "distance to this node" before storing"""
+        if score >= mate_threshold:
+            return score + ply
+        if score <= -mate_threshold:
+            return score - ply
+        return score
+
+    @staticmethod
+    def score_from_tt(score, ply, mate_threshold):
+        """Convert a stored mate score back to "distance to root" at the probing ply"""
+        if score >= mate_threshold:
+            return score - ply
+        if score <= -mate_threshold:
+            return score + ply
+        return score
+
 
 class PerformanceMonitor:
     """Monitor AI performance metrics"""
@@ -2,6 +2,7 @@
 """Module providing the property of abstract class and team members"""
 from abc import ABC, abstractmethod
 from team import Team
+import evaluation
 
 
 class Piece(ABC):
@@ -100,6 +101,18 @@ class Piece(ABC):
         """Return True if the piece has crossed the river"""
         return abs(self.position[0] + 9 * (self.team.value - 1) / 2) < 5
 
+    def tapered_value(self) -> float:
+        """Return the value of the piece in value pack 3,
+        blending its opening and endgame weights by the game phase"""
+        notation = self.board[self.position[0]][self.position[1]]
+        phase = evaluation.get_tapered_scores(self.board)[2]
+        scores = (
+            evaluation.MG_TABLE[notation][self.position[0]][self.position[1]],
+            evaluation.EG_TABLE[notation][self.position[0]][self.position[1]],
+            phase,
+        )
+        return evaluation.blend(scores) / evaluation.SCORE_SCALE * self.team.value
+
     # Abstract method
     @abstractmethod
     def piece_value(self, value_pack=0) -> float:
@@ -229,6 +242,10 @@ class Advisor(Piece):
 
             return self._piece_value + change
 
+        # Value pack 3: Tapered evaluation
+        elif value_pack == 3:
+            return self.tapered_value()
+
         # If the value pack is not found
         else:
             raise ValueError("Value pack is not found")
@@ -292,6 +309,10 @@ class Cannon(Piece):
             change += (16 - self.number_of_team_pieces) * 0.25
             return self._piece_value + change
 
+        # Value pack 3: Tapered evaluation
+        elif value_pack == 3:
+            return self.tapered_value()
+
         # If the value pack is not found
         else:
             raise ValueError("Value pack is not found")
@@ -383,6 +404,10 @@ class Rook(Piece):
             change += (32 - self.number_of_pieces) * int(self.is_crossed_river())
             return self._piece_value + change
 
+        # Value pack 3: Tapered evaluation
+        elif value_pack == 3:
+            return self.tapered_value()
+
         # If the value pack is not found
         else:
             raise ValueError("Value pack is not found")
@@ -480,6 +505,10 @@ class Elephant(Piece):
                         break
             return self._piece_value + change
 
+        # Value pack 3: Tapered evaluation
+        elif value_pack == 3:
+            return self.tapered_value()
+
         # If the value pack is not found
         else:
             raise ValueError("Value pack is not found")
@@ -553,6 +582,10 @@ class General(Piece):
 
             return self._piece_value + change
 
+        # Value pack 3: Tapered evaluation
+        elif value_pack == 3:
+            return self.tapered_value()
+
         # If the value pack is not found
         else:
             raise ValueError("Value pack is not found")
@@ -793,6 +826,10 @@ class Pawn(Piece):
             change += (16 - self.number_of_team_pieces) * 2
             return self._piece_value + change
 
+        # Value pack 3: Tapered evaluation
+        elif value_pack == 3:
+            return self.tapered_value()
+
         # If the value pack is not found
         else:
             raise ValueError("Value pack is not found")
@@ -874,6 +911,10 @@ class Horse(Piece):
 
             return self._piece_value + change
 
+        # Value pack 3: Tapered evaluation
+        elif value_pack == 3:
+            return self.tapered_value()
+
         # If the value pack is not found
         else:
             raise ValueError("Value pack is not found")
@@ -0,0 +1,305 @@
+"""
+Threat Analysis for Chinese Chess AI
+Per-position attack maps and hanging pieces, cached by position hash
+"""
+
+from piece import Piece
+from team import Team
+from performance_utils import LRUCache
+from optimization_config import THREAT_CACHE_SIZE
+
+# Centipawn value of each piece type for threat and exchange purposes
+THREAT_PIECE_VALUES = {
+    "R": 900,
+    "C": 450,
+    "H": 400,
+    "E": 250,
+    "A": 200,
+    "P": 100,
+    "G": 10000,
+}
+
+# Movement offsets
+_STRAIGHT_DIRECTIONS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+_HORSE_MOVES = (
+    # (leg offset, goal offset)
+    ((1, 0), (2, 1)), ((1, 0), (2, -1)),
+    ((-1, 0), (-2, 1)), ((-1, 0), (-2, -1)),
+    ((0, 1), (1, 2)), ((0, 1), (-1, 2)),
+    ((0, -1), (1, -2)), ((0, -1), (-1, -2)),
+)
+_ELEPHANT_MOVES = (((1, 1), (2, 2)), ((1, -1), (2, -2)), ((-1, 1), (-2, 2)), ((-1, -1), (-2, -2)))
+_ADVISOR_MOVES = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def _on_board(x: int, y: int) -> bool:
+    return 0 <= x < Piece.BOARD_SIZE_X and 0 <= y < Piece.BOARD_SIZE_Y
+
+
+def get_attacked_squares(board: list, position: tuple) -> list:
+    """Return every square the piece on the position attacks,
+    including squares occupied by its teammates (which it defends)"""
+    x, y = position
+    notation = board[x][y]
+    team = Team[notation[0]]
+    piece_type = notation[1]
+    squares = []
+
+    if piece_type == "R":
+        for dx, dy in _STRAIGHT_DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            while _on_board(nx, ny):
+                squares.append((nx, ny))
+                if board[nx][ny] != "NN":
+                    break
+                nx, ny = nx + dx, ny + dy
+
+    elif piece_type == "C":
+        # The cannon attacks the first piece behind a screen
+        for dx, dy in _STRAIGHT_DIRECTIONS:
+            nx, ny = x + dx, y + dy
+            screen_found = False
+            while _on_board(nx, ny):
+                if board[nx][ny] != "NN":
+                    if screen_found:
+                        squares.append((nx, ny))
+                        break
+                    screen_found = True
+                nx, ny = nx + dx, ny + dy
+
+    elif piece_type == "H":
+        # The horse is blocked by a piece on its leg
+        for (lx, ly), (gx, gy) in _HORSE_MOVES:
+            if (
+                _on_board(x + gx, y + gy)
+                and board[x + lx][y + ly] == "NN"
+            ):
+                squares.append((x + gx, y + gy))
+
+    elif piece_type == "E":
+        # The elephant is blocked on its eye and cannot cross the river
+        for (ex, ey), (gx, gy) in _ELEPHANT_MOVES:
+            nx, ny = x + gx, y + gy
+            if (
+                _on_board(nx, ny)
+                and board[x + ex][y + ey] == "NN"
+                and (nx >= 5 if team is Team.RED else nx <= 4)
+            ):
+                squares.append((nx, ny))
+
+    elif piece_type == "A":
+        for dx, dy in _ADVISOR_MOVES:
+            if Piece.is_position_in_palace((x + dx, y + dy)):
+                squares.append((x + dx, y + dy))
+
+    elif piece_type == "G":
+        for dx, dy in _STRAIGHT_DIRECTIONS:
+            if Piece.is_position_in_palace((x + dx, y + dy)):
+                squares.append((x + dx, y + dy))
+
+        # Flying general: the opposing general on the same open file
+        step = -team.value
+        nx = x + step
+        while _on_board(nx, y):
+            if board[nx][y] != "NN":
+                if board[nx][y][1] == "G":
+                    squares.append((nx, y))
+                break
+            nx += step
+
+    elif piece_type == "P":
+        forward = x - team.value
+        if _on_board(forward, y):
+            squares.append((forward, y))
+        if (x <= 4) if team is Team.RED else (x >= 5):
+            for ny in (y - 1, y + 1):
+                if _on_board(x, ny):
+                    squares.append((x, ny))
+
+    return squares
+
+
+def get_attackers(board: list, target: tuple, team: Team) -> list:
+    """Return the positions of the team's pieces that could capture on the target
+    square, looking outwards from it (screens, legs and palaces included)"""
+    tx, ty = target
+    team_letter = "R" if team is Team.RED else "B"
+    attackers = []
+
+    # Rooks and generals on the first piece of each line, cannons on the second
+    for dx, dy in _STRAIGHT_DIRECTIONS:
+        nx, ny = tx + dx, ty + dy
+        pieces_found = 0
+        while _on_board(nx, ny):
+            notation = board[nx][ny]
+            if notation != "NN":
+                pieces_found += 1
+                if notation[0] == team_letter:
+                    if pieces_found == 1 and notation[1] == "R":
+                        attackers.append((nx, ny))
+                    elif pieces_found == 1 and notation[1] == "G" and (
+                        (abs(nx - tx) + abs(ny - ty) == 1 and Piece.is_position_in_palace(target))
+                        or (dy == 0 and board[tx][ty][1:] == "G")
+                    ):
+                        attackers.append((nx, ny))
+                    elif pieces_found == 2 and notation[1] == "C":
+                        attackers.append((nx, ny))
+                if pieces_found == 2:
+                    break
+            nx, ny = nx + dx, ny + dy
+
+    # Horses whose leg is free
+    for (lx, ly), (gx, gy) in _HORSE_MOVES:
+        hx, hy = tx - gx, ty - gy
+        if (
+            _on_board(hx, hy)
+            and board[hx][hy] == team_letter + "H"
+            and board[hx + lx][hy + ly] == "NN"
+        ):
+            attackers.append((hx, hy))
+
+    # Elephants whose eye is free, on their own side of the river
+    if (tx >= 5) if team is Team.RED else (tx <= 4):
+        for (ex, ey), (gx, gy) in _ELEPHANT_MOVES:
+            hx, hy = tx - gx, ty - gy
+            if (
+                _on_board(hx, hy)
+                and board[hx][hy] == team_letter + "E"
+                and board[hx + ex][hy + ey] == "NN"
+            ):
+                attackers.append((hx, hy))
+
+    # Advisors inside the palace
+    if Piece.is_position_in_palace(target):
+        for dx, dy in _ADVISOR_MOVES:
+            hx, hy = tx - dx, ty - dy
+            if _on_board(hx, hy) and board[hx][hy] == team_letter + "A":
+                attackers.append((hx, hy))
+
+    # Pawns from behind, and from the sides once they crossed the river
+    px = tx + team.value
+    if _on_board(px, ty) and board[px][ty] == team_letter + "P":
+        attackers.append((px, ty))
+    if (tx <= 4) if team is Team.RED else (tx >= 5):
+        for py in (ty - 1, ty + 1):
+            if _on_board(tx, py) and board[tx][py] == team_letter + "P":
+                attackers.append((tx, py))
+
+    return attackers
+
+
+def static_exchange_evaluation(board: list, old_pos: tuple, new_pos: tuple) -> int:
+    """Return the material balance (in centipawns, for the moving side) of the
+    capture sequence on the target square, each side recapturing with its
+    least valuable attacker and free to stop when recapturing loses material.
+    Attackers are regenerated after every capture, so cannon screens,
+    horse legs and x-ray attackers are resolved on the updated board"""
+    board = [row[:] for row in board]
+    mover = board[old_pos[0]][old_pos[1]]
+    victim = board[new_pos[0]][new_pos[1]]
+
+    gains = [THREAT_PIECE_VALUES[victim[1]] if victim != "NN" else 0]
+    piece_on_target = mover[1]
+    board[new_pos[0]][new_pos[1]] = mover
+    board[old_pos[0]][old_pos[1]] = "NN"
+    side = Team.get_reverse_team(Team[mover[0]])
+
+    while True:
+        attackers = get_attackers(board, new_pos, side)
+        if not attackers:
+            break
+
+        # Recapture with the least valuable attacker
+        ax, ay = min(attackers, key=lambda pos: THREAT_PIECE_VALUES[board[pos[0]][pos[1]][1]])
+        gains.append(THREAT_PIECE_VALUES[piece_on_target] - gains[-1])
+
+        # Capturing the general ends the sequence
+        if piece_on_target == "G":
+            break
+
+        piece_on_target = board[ax][ay][1]
+        board[new_pos[0]][new_pos[1]] = board[ax][ay]
+        board[ax][ay] = "NN"
+        side = Team.get_reverse_team(side)
+
+    # Negamax the swap list: each side may stand pat instead of recapturing
+    for index in range(len(gains) - 1, 0, -1):
+        gains[index - 1] = -max(-gains[index - 1], gains[index])
+
+    return gains[0]
+
+
+class ThreatAnalysis:
+    """This class holds the attack information of a board:
+    the attackers of every square and the hanging pieces of each team"""
+
+    def __init__(self, board: list) -> None:
+        # square -> list of attacker positions, for each team
+        self.attackers = {Team.RED: dict(), Team.BLACK: dict()}
+        # list of (position, value at risk), largest first, for each team
+        self.hanging = {Team.RED: list(), Team.BLACK: list()}
+
+        for x in range(Piece.BOARD_SIZE_X):
+            for y in range(Piece.BOARD_SIZE_Y):
+                notation = board[x][y]
+                if notation == "NN":
+                    continue
+                team_attacks = self.attackers[Team[notation[0]]]
+                for square in get_attacked_squares(board, (x, y)):
+                    team_attacks.setdefault(square, []).append((x, y))
+
+        for x in range(Piece.BOARD_SIZE_X):
+            for y in range(Piece.BOARD_SIZE_Y):
+                notation = board[x][y]
+                if notation == "NN" or notation[1] == "G":
+                    continue
+                team = Team[notation[0]]
+                enemy_attackers = self.attackers[Team.get_reverse_team(team)].get((x, y))
+                if not enemy_attackers:
+                    continue
+
+                value = THREAT_PIECE_VALUES[notation[1]]
+                # Undefended pieces lose their full value,
+                # defended ones lose the difference to the cheapest attacker
+                if (x, y) not in self.attackers[team]:
+                    risk = value
+                else:
+                    cheapest = min(
+                        THREAT_PIECE_VALUES[board[ax][ay][1]] for ax, ay in enemy_attackers
+                    )
+                    risk = value - cheapest
+
+                if risk > 0:
+                    self.hanging[team].append(((x, y), risk))
+
+        for team in (Team.RED, Team.BLACK):
+            self.hanging[team].sort(key=lambda item: item[1], reverse=True)
+
+        self._hanging_positions = {
+            team: dict(self.hanging[team]) for team in (Team.RED, Team.BLACK)
+        }
+
+    def is_attacked(self, position: tuple, by_team: Team) -> bool:
+        """Return True if the square is attacked by the team"""
+        return position in self.attackers[by_team]
+
+    def hanging_value(self, position: tuple, team: Team) -> int:
+        """Return the value at risk of the team's piece on the position (0 if safe)"""
+        return self._hanging_positions[team].get(position, 0)
+
+    def max_hanging_value(self, team: Team) -> int:
+        """Return the largest value at risk among the team's pieces"""
+        return self.hanging[team][0][1] if self.hanging[team] else 0
+
+
+# Global cache of analyses, keyed by position hash
+threat_cache = LRUCache(THREAT_CACHE_SIZE)
+
+
+def get_threat_analysis(board: list, position_hash: int) -> ThreatAnalysis:
+    """Return the (cached) threat analysis of a board"""
+    analysis = threat_cache.get(position_hash)
+    if analysis is None:
+        analysis = ThreatAnalysis(board)
+        threat_cache.put(position_hash, analysis)
+    return analysis
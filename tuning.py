@@ -0,0 +1,271 @@
+"""
+Offline Evaluation Tuning for Chinese Chess AI
+Fits the value pack 3 tables to self-play results with a Texel-style logistic loss
+
+Usage:
+    python tuning.py self_play_data.txt -o tuned_value_pack.json --epochs 50
+"""
+
+import argparse
+import time
+import evaluation
+from optimization_config import SELF_PLAY_DATA_FILE, TUNED_VALUE_PACK_FILE
+
+# NumPy is only needed by the tuner itself, not by the recorder used in main.py
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+# ========== SELF-PLAY DATA FORMAT ==========
+# One fixed-width line per position: <GameState.encode()> <result>\n
+# where the result is "R" (red won), "B" (black won) or "D" (draw).
+
+PIECE_TYPES = "RHCEAPG"
+LINE_LENGTH = 94
+MAX_PIECES = 32
+
+
+def record_self_play_game(path: str, encodings: list, result: str) -> None:
+    """Append the encoded positions of a finished game with its result"""
+    with open(path, "a") as f:
+        for code in encodings:
+            f.write(code + " " + result + "\n")
+
+
+def load_self_play_data(path: str) -> tuple:
+    """Load recorded positions as packed piece arrays.
+    Return (codes, signs, phases, results) where codes[i, k] = type * 90 + square
+    (square seen from red's side), signs[i, k] is +1/-1 (0 for padding),
+    phases[i] is in [0, 1] and results[i] is the red score in {0, 0.5, 1}"""
+    with open(path, "rb") as f:
+        raw = np.frombuffer(f.read(), dtype=np.uint8)
+    lines = raw[: raw.size - raw.size % LINE_LENGTH].reshape(-1, LINE_LENGTH)
+    boards = lines[:, :90]
+
+    # Character -> piece type / sign lookup tables
+    type_lookup = np.full(256, -1, dtype=np.int16)
+    sign_lookup = np.zeros(256, dtype=np.int8)
+    phase_lookup = np.zeros(256, dtype=np.int16)
+    for index, piece_type in enumerate(PIECE_TYPES):
+        for char, sign in ((piece_type, 1), (piece_type.lower(), -1)):
+            type_lookup[ord(char)] = index
+            sign_lookup[ord(char)] = sign
+            phase_lookup[ord(char)] = evaluation.PHASE_WEIGHTS[piece_type]
+
+    piece_types = type_lookup[boards]
+    signs = sign_lookup[boards]
+
+    # Black pieces use the mirrored square so both teams share one table
+    squares = np.broadcast_to(np.arange(90, dtype=np.int16), boards.shape)
+    mirrored = (9 - squares // 9) * 9 + squares % 9
+    squares = np.where(signs < 0, mirrored, squares)
+
+    # Compact the (at most 32) occupied squares of every position to the left
+    occupied = piece_types >= 0
+    rows, cols = np.nonzero(occupied)
+    slots = (np.cumsum(occupied, axis=1) - 1)[rows, cols]
+    keep = slots < MAX_PIECES
+    rows, cols, slots = rows[keep], cols[keep], slots[keep]
+
+    codes = np.zeros((boards.shape[0], MAX_PIECES), dtype=np.int16)
+    packed_signs = np.zeros((boards.shape[0], MAX_PIECES), dtype=np.int8)
+    codes[rows, slots] = piece_types[rows, cols] * 90 + squares[rows, cols]
+    packed_signs[rows, slots] = signs[rows, cols]
+
+    phases = phase_lookup[boards].sum(axis=1).astype(np.float32)
+    phases = np.minimum(phases, evaluation.MAX_PHASE) / evaluation.MAX_PHASE
+
+    results = np.select(
+        [lines[:, 92] == ord("R"), lines[:, 92] == ord("B")], [1.0, 0.0], 0.5
+    ).astype(np.float32)
+
+    return codes, packed_signs, phases, results
+
+
+# ========== PARAMETERS ==========
+
+def get_initial_parameters() -> tuple:
+    """Return the current tables as flat (material, piece-square) arrays
+    of shapes (2, 7) and (2, 630) for the opening and endgame"""
+    material = np.array(
+        [
+            [evaluation.MATERIAL_MG[t] for t in PIECE_TYPES],
+            [evaluation.MATERIAL_EG[t] for t in PIECE_TYPES],
+        ],
+        dtype=np.float64,
+    )
+    pst = np.array(
+        [
+            np.concatenate([np.ravel(evaluation.PST_MG[t]) for t in PIECE_TYPES]),
+            np.concatenate([np.ravel(evaluation.PST_EG[t]) for t in PIECE_TYPES]),
+        ],
+        dtype=np.float64,
+    )
+    return material, pst
+
+
+def save_parameters(path: str, material, pst) -> None:
+    """Round the fitted parameters and write them as a value pack 3 table"""
+    material = np.rint(material).astype(int)
+    pst = np.rint(pst).astype(int).reshape(2, len(PIECE_TYPES), 10, 9)
+    evaluation.save_tables(
+        path,
+        {t: int(material[0, i]) for i, t in enumerate(PIECE_TYPES)},
+        {t: int(material[1, i]) for i, t in enumerate(PIECE_TYPES)},
+        {t: pst[0, i].tolist() for i, t in enumerate(PIECE_TYPES)},
+        {t: pst[1, i].tolist() for i, t in enumerate(PIECE_TYPES)},
+    )
+
+
+# ========== LOSS AND GRADIENT ==========
+
+def evaluate_batch(material, pst, codes, signs, phases):
+    """Vectorized value pack 3 evaluation of a batch of positions"""
+    full = pst + np.repeat(material, 90, axis=1)
+    weights = signs * phases[:, None]
+    mg_values = full[0][codes] * weights
+    eg_values = full[1][codes] * (signs - weights)
+    return (mg_values + eg_values).sum(axis=1)
+
+
+def loss_and_gradient(material, pst, codes, signs, phases, results, k):
+    """Return the mean squared error between the results and the sigmoid
+    of the evaluation, and its gradient with respect to the piece-square
+    weights (the material gradient is the per-type sum of it)"""
+    values = evaluate_batch(material, pst, codes, signs, phases)
+    predictions = 1.0 / (1.0 + np.exp(-k * values))
+    errors = results - predictions
+    loss = np.mean(errors * errors)
+
+    # dL/dvalue for every position, then spread over its pieces
+    d_values = -2.0 * errors * predictions * (1.0 - predictions) * k / len(results)
+    weights = signs * phases[:, None]
+    flat_codes = codes.ravel()
+    grad_pst = np.empty_like(pst)
+    grad_pst[0] = np.bincount(
+        flat_codes, weights=(d_values[:, None] * weights).ravel(), minlength=630
+    )
+    grad_pst[1] = np.bincount(
+        flat_codes, weights=(d_values[:, None] * (signs - weights)).ravel(), minlength=630
+    )
+    grad_material = grad_pst.reshape(2, len(PIECE_TYPES), 90).sum(axis=2)
+    return loss, grad_material, grad_pst
+
+
+def evaluate_all(material, pst, data, batch_size):
+    """Return the evaluation of every position, computed in batches"""
+    codes, signs, phases, results = data
+    values = np.empty(len(results), dtype=np.float64)
+    for start in range(0, len(results), batch_size):
+        stop = start + batch_size
+        values[start:stop] = evaluate_batch(
+            material, pst, codes[start:stop], signs[start:stop], phases[start:stop]
+        )
+    return values
+
+
+def total_loss(material, pst, data, k, batch_size) -> float:
+    """Return the loss over the whole data set"""
+    errors = data[3] - 1.0 / (1.0 + np.exp(-k * evaluate_all(material, pst, data, batch_size)))
+    return float(np.mean(errors * errors))
+
+
+def fit_scaling_constant(material, pst, data, batch_size) -> float:
+    """Find the sigmoid scaling constant K that best fits the current weights
+    (golden-section search on a log scale)"""
+    values, results = evaluate_all(material, pst, data, batch_size), data[3]
+
+    def loss(log_k):
+        errors = results - 1.0 / (1.0 + np.exp(-np.exp(log_k) * values))
+        return np.mean(errors * errors)
+
+    low, high = np.log(1e-4), np.log(1.0)
+    ratio = (np.sqrt(5) - 1) / 2
+    for _ in range(30):
+        left = high - ratio * (high - low)
+        right = low + ratio * (high - low)
+        if loss(left) < loss(right):
+            high = right
+        else:
+            low = left
+    return float(np.exp((low + high) / 2))
+
+
+# ========== TUNER ==========
+
+def tune(
+    data_path: str = SELF_PLAY_DATA_FILE,
+    output_path: str = TUNED_VALUE_PACK_FILE,
+    epochs: int = 50,
+    batch_size: int = 65536,
+    learning_rate: float = 0.5,
+    regularization: float = 1e-6,
+    seed: int = 0,
+) -> None:
+    """Fit the value pack 3 tables with mini-batch Adam and write them out"""
+    if np is None:
+        raise ImportError("NumPy is required for tuning (pip install numpy)")
+
+    start = time.time()
+    data = load_self_play_data(data_path)
+    codes, signs, phases, results = data
+    print(f"Loaded {len(results):,} positions in {time.time() - start:.1f}s")
+
+    material, pst = get_initial_parameters()
+    k = fit_scaling_constant(material, pst, data, batch_size)
+    print(f"K = {k:.5f}, initial loss = {total_loss(material, pst, data, k, batch_size):.6f}")
+
+    # Adam optimizer state
+    rng = np.random.default_rng(seed)
+    moments = [np.zeros_like(material), np.zeros_like(pst)]
+    velocities = [np.zeros_like(material), np.zeros_like(pst)]
+    beta1, beta2, epsilon, step = 0.9, 0.999, 1e-8, 0
+
+    for epoch in range(epochs):
+        order = rng.permutation(len(results))
+        for begin in range(0, len(results), batch_size):
+            batch = order[begin:begin + batch_size]
+            _, grad_material, grad_pst = loss_and_gradient(
+                material, pst, codes[batch], signs[batch], phases[batch], results[batch], k
+            )
+            grad_pst += regularization * pst
+            # The general's value is fixed, only its placement is tuned
+            grad_material[:, PIECE_TYPES.index("G")] = 0
+
+            step += 1
+            for index, (param, grad) in enumerate(((material, grad_material), (pst, grad_pst))):
+                moments[index] = beta1 * moments[index] + (1 - beta1) * grad
+                velocities[index] = beta2 * velocities[index] + (1 - beta2) * grad * grad
+                m_hat = moments[index] / (1 - beta1 ** step)
+                v_hat = velocities[index] / (1 - beta2 ** step)
+                param -= learning_rate * m_hat / (np.sqrt(v_hat) + epsilon)
+
+        print(
+            f"Epoch {epoch + 1}/{epochs}: loss = {total_loss(material, pst, data, k, batch_size):.6f}"
+            f" ({time.time() - start:.1f}s)"
+        )
+
+    save_parameters(output_path, material, pst)
+    print(f"Tuned value pack written to {output_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune value pack 3 from self-play data")
+    parser.add_argument("data", nargs="?", default=SELF_PLAY_DATA_FILE)
+    parser.add_argument("-o", "--output", default=TUNED_VALUE_PACK_FILE)
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=65536)
+    parser.add_argument("--learning-rate", type=float, default=0.5)
+    parser.add_argument("--regularization", type=float, default=1e-6)
+    args = parser.parse_args()
+
+    tune(
+        args.data,
+        args.output,
+        args.epochs,
+        args.batch_size,
+        args.learning_rate,
+        args.regularization,
+    )